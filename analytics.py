@@ -0,0 +1,131 @@
+import logging
+from array import array
+from bisect import bisect_left
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+GROUP_FIELDS = ("company", "category", "sub_category")
+
+
+def encode_rows(rows, labels, label_codes, codes, prices, stocks):
+    for company, category, sub_category, price, stock in rows:
+        for attribute, value in zip(GROUP_FIELDS, (company, category, sub_category)):
+            code = label_codes.get(value)
+            if code is None:
+                code = label_codes[value] = len(labels)
+                labels.append(value)
+            codes[attribute].append(code)
+        prices.append(price)
+        stocks.append(stock)
+
+
+def column_arrays(data_layer):
+    products = data_layer.products
+    if hasattr(products, "code_columns"):
+        logging.debug("Copying columns of the column store")
+        with data_layer.read_locked():
+            return (list(products.strings), {attribute: array("I", column) for attribute, column in
+                                             products.code_columns.items()},
+                    array("d", products.prices), array("q", products.stocks))
+
+    labels, codes = [], {attribute: array("I") for attribute in GROUP_FIELDS}
+    prices, stocks = array("d"), array("q")
+    if hasattr(data_layer, "stock_overrides"):
+        logging.debug("Copying columns of the mapped snapshot")
+        with data_layer.read_locked():
+            labels = [data_layer.text_at("value", code) for code in range(len(data_layer.offsets["value"]) - 1)]
+            for attribute in GROUP_FIELDS:
+                codes[attribute].extend(data_layer.codes[attribute])
+            prices.extend(data_layer.prices)
+            stocks.extend(data_layer.stocks)
+            for row, stock in data_layer.stock_overrides.items():
+                stocks[row] = stock
+            products = data_layer.delta.products
+            rows = [(p.company, p.category, p.sub_category, p.price, p.stock) for p in products.values()]
+    elif hasattr(data_layer, "iter_rows"):
+        rows = data_layer.iter_rows("company, category, sub_category, price, stock")
+    else:
+        rows = ((p.company, p.category, p.sub_category, p.price, p.stock) for p in products.values())
+    encode_rows(rows, labels, {label: code for code, label in enumerate(labels)}, codes, prices, stocks)
+    return labels, codes, prices, stocks
+
+
+def group_totals(labels, codes, prices, stocks):
+    if np is not None:
+        np_codes = np.frombuffer(codes, dtype=f"u{codes.itemsize}")
+        np_stocks = np.frombuffer(stocks, dtype=np.int64)
+        counts = np.bincount(np_codes, minlength=len(labels)).tolist()
+        stock_sums = np.bincount(np_codes, weights=np_stocks, minlength=len(labels)).tolist()
+        values = np.bincount(np_codes, weights=np.frombuffer(prices, dtype=np.float64) * np_stocks,
+                             minlength=len(labels)).tolist()
+    else:
+        counts, stock_sums, values = [0] * len(labels), [0] * len(labels), [0.0] * len(labels)
+        for code, price, stock in zip(codes, prices, stocks):
+            counts[code] += 1
+            stock_sums[code] += stock
+            values[code] += price * stock
+    groups = {labels[code]: {"products": count, "stock": int(stock_sums[code]), "value": round(values[code], 2)}
+              for code, count in enumerate(counts) if count}
+    return dict(sorted(groups.items(), key=lambda item: -item[1]["value"]))
+
+
+def stock_value(prices, stocks):
+    if np is not None:
+        return float(np.dot(np.frombuffer(prices, dtype=np.float64), np.frombuffer(stocks, dtype=np.int64)))
+    return sum((price * stock for price, stock in zip(prices, stocks)), 0.0)
+
+
+def histogram_edges(low, high, bins):
+    low, high = float(low), float(high)
+    if low == high:
+        low, high = low - 0.5, high + 0.5
+    return [low + (high - low) * index / bins for index in range(bins)] + [high]
+
+
+def distribution(column, percentiles, bins):
+    if not len(column):
+        return {"min": None, "max": None, "mean": None, "percentiles": {}, "histogram": {"edges": [], "counts": []}}
+    if np is not None:
+        values = np.frombuffer(column, dtype=np.float64 if column.typecode == "d" else np.int64)
+        counts, edges = np.histogram(values, bins=bins)
+        return {"min": values.min().item(), "max": values.max().item(), "mean": values.mean().item(),
+                "percentiles": dict(zip(percentiles, np.percentile(values, percentiles).tolist())),
+                "histogram": {"edges": edges.tolist(), "counts": counts.tolist()}}
+
+    values = sorted(column)
+    last = len(values) - 1
+    ranks = {}
+    for percentile in percentiles:
+        position = last * percentile / 100
+        lower = int(position)
+        upper = min(lower + 1, last)
+        ranks[percentile] = values[lower] + (values[upper] - values[lower]) * (position - lower)
+    edges = histogram_edges(values[0], values[-1], bins)
+    counts, start = [], 0
+    for edge in edges[1:-1]:
+        end = bisect_left(values, edge, start)
+        counts.append(end - start)
+        start = end
+    counts.append(len(values) - start)
+    return {"min": values[0], "max": values[-1], "mean": sum(values) / len(values), "percentiles": ranks,
+            "histogram": {"edges": edges, "counts": counts}}
+
+
+def inventory_report(data_layer, percentiles=(25, 50, 75, 90, 99), bins=10):
+    labels, codes, prices, stocks = column_arrays(data_layer)
+    logging.info("Building inventory report over [%s] product(s) | NumPy: %s", len(prices), np is not None)
+    by_group = {attribute: group_totals(labels, codes[attribute], prices, stocks) for attribute in GROUP_FIELDS}
+    return {
+        "engine": "numpy" if np is not None else "python",
+        "products": len(prices),
+        "total_stock": sum(group["stock"] for group in by_group["category"].values()),
+        "total_value": round(stock_value(prices, stocks), 2),
+        "value_by_company": by_group["company"],
+        "value_by_category": by_group["category"],
+        "value_by_sub_category": by_group["sub_category"],
+        "price": distribution(prices, percentiles, bins),
+        "stock": distribution(stocks, percentiles, bins),
+    }
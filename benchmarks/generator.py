@@ -0,0 +1,54 @@
+import random
+
+CATALOG = {
+    "Electronics": ["Phone", "Laptop", "Tablet", "Television", "Camera", "Headphones"],
+    "Food": ["Grain", "Snacks", "Beverage", "Dairy", "Frozen", "Spices"],
+    "Clothing": ["Shirt", "Trousers", "Shoes", "Jacket", "Hat"],
+    "Home": ["Kitchen", "Furniture", "Lighting", "Bedding"],
+    "Beauty": ["Skincare", "Haircare", "Fragrance"],
+    "Toys": ["Puzzle", "Board game", "Doll"],
+    "Sports": ["Fitness", "Outdoor", "Cycling"],
+    "Office": ["Stationery", "Printer", "Paper"],
+}
+ADJECTIVES = ["Classic", "Premium", "Ultra", "Smart", "Eco", "Mini", "Pro", "Max", "Lite", "Super",
+              "Fresh", "Organic", "Wireless", "Portable", "Deluxe", "Basic"]
+NOUNS = ["rice", "phone", "charger", "speaker", "kettle", "blender", "sneaker", "backpack", "lamp",
+         "notebook", "cereal", "juice", "shampoo", "jacket", "bike", "puzzle", "monitor", "router"]
+SYLLABLES = ["son", "tek", "ra", "vo", "lux", "ne", "max", "zen", "ko", "pi", "dor", "al", "ix", "ma"]
+
+
+def zipf_weights(count, skew=1.1):
+    return [1 / (rank ** skew) for rank in range(1, count + 1)]
+
+
+def make_companies(rnd, count):
+    companies = set()
+    while len(companies) < count:
+        companies.add("".join(rnd.choice(SYLLABLES) for _ in range(rnd.randint(2, 3))).upper())
+    return sorted(companies)
+
+
+def generate_products(size, seed=42, duplicate_rate=0.05, company_count=None):
+    rnd = random.Random(seed)
+    companies = make_companies(rnd, company_count or max(10, size // 200))
+    company_weights = zipf_weights(len(companies))
+    categories = list(CATALOG)
+    category_weights = zipf_weights(len(categories), skew=0.8)
+    used_names = []
+
+    for index in range(size):
+        if used_names and rnd.random() < duplicate_rate:
+            name = rnd.choice(used_names)
+        else:
+            name = f"{rnd.choice(ADJECTIVES)} {rnd.choice(NOUNS)} {rnd.randint(1, 999)}".capitalize()
+            if len(used_names) < 50000:
+                used_names.append(name)
+        category = rnd.choices(categories, category_weights)[0]
+        yield [
+            name,
+            rnd.choices(companies, company_weights)[0],
+            category,
+            rnd.choice(CATALOG[category]),
+            round(rnd.lognormvariate(3, 1), 2),
+            int(rnd.expovariate(1 / 40)),
+        ]
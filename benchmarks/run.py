@@ -0,0 +1,201 @@
+import argparse, json, os, platform, random, sys, tempfile, time, tracemalloc
+
+import main
+from benchmarks.generator import generate_products
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+FIELDS = ["name", "company", "category", "sub_category", "price", "stock", "ID"]
+
+
+def summarize(samples_ns):
+    if not samples_ns:
+        return {"ops": 0}
+    samples_ns = sorted(samples_ns)
+    total = sum(samples_ns)
+    return {
+        "ops": len(samples_ns),
+        "throughput": len(samples_ns) / (total / 1e9) if total else None,
+        "p50_us": samples_ns[int(0.50 * (len(samples_ns) - 1))] / 1000,
+        "p99_us": samples_ns[int(0.99 * (len(samples_ns) - 1))] / 1000,
+    }
+
+
+def timed(func, calls):
+    samples = []
+    for args in calls:
+        start = time.perf_counter_ns()
+        func(*args)
+        samples.append(time.perf_counter_ns() - start)
+    return summarize(samples)
+
+
+def peak_rss_kb():
+    if resource is None:
+        return None
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def make_operation_layer(backend, workdir, cache_size=0):
+    if backend == "sqlite":
+        data_layer = main.SQLiteDataLayer(os.path.join(workdir, f"bench-{time.time_ns()}.db"))
+    elif backend == "columnar":
+        data_layer = main.ColumnarDataLayer()
+    elif backend == "sharded":
+        data_layer = main.ShardedDataLayer()
+    else:
+        data_layer = main.DataLayer()
+    return main.OperationLayer(data_layer, cache_size=cache_size)
+
+
+def build_inventory(ol, size, seed):
+    samples = []
+    for product_list in generate_products(size, seed):
+        product_list.append(ol.allocate_id(product_list))
+        product_data = dict(zip(FIELDS, product_list))
+        start = time.perf_counter_ns()
+        ol.dl.add_product(product_data)
+        samples.append(time.perf_counter_ns() - start)
+    return summarize(samples)
+
+
+def traced_build_peak(backend, workdir, size, seed):
+    tracemalloc.start()
+    ol = make_operation_layer(backend, workdir)
+    for product_list in generate_products(size, seed):
+        product_list.append(ol.allocate_id(product_list))
+        ol.dl.add_product(dict(zip(FIELDS, product_list)))
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    ol.dl.close()
+    return peak
+
+
+def create_id_chain(ol, ops):
+    samples = []
+    product_list = ["Chain product", "BENCH", "Bench", "Chain"]
+    for index in range(ops):
+        start = time.perf_counter_ns()
+        i_d = ol.allocate_id(product_list)
+        samples.append(time.perf_counter_ns() - start)
+        ol.dl.add_product(dict(zip(FIELDS, product_list + [float(index), index, i_d])))
+    return summarize(samples)
+
+
+def run_size(backend, workdir, size, ops, seed, trace_memory):
+    rnd = random.Random(seed)
+    ol = make_operation_layer(backend, workdir)
+    results = {"add_product": build_inventory(ol, size, seed)}
+    results["create_id_chain"] = create_id_chain(ol, ops)
+
+    products = list(ol.check_empty_product().values()) if backend not in ("sqlite", "sharded") else \
+        ol.dl.fetch_products(rnd.sample(list(ol.check_empty_product()), min(ops, size)))
+    sample = [rnd.choice(products) for _ in range(ops)]
+    companies = ol.get_facet_values("Company")
+    categories = ol.get_facet_values("Category")
+
+    queries = []
+    for product in sample:
+        pick = rnd.random()
+        if pick < 0.6:
+            start = rnd.randint(0, max(0, len(product.name) - 3))
+            queries.append((product.name[start:start + rnd.randint(3, 8)],))
+        elif pick < 0.8:
+            queries.append((rnd.choice(companies).lower(),))
+        elif pick < 0.9:
+            queries.append((rnd.choice(categories),))
+        else:
+            queries.append(("Zzqx",))
+    results["search_data"] = timed(ol.search_data, queries)
+    results["check_name"] = timed(ol.check_name, [(p.name if rnd.random() < 0.8 else "Missing name",)
+                                                   for p in sample])
+    results["inventory_analysis"] = timed(ol.inventory_analysis, [()] * max(20, ops // 10))
+    cached = main.OperationLayer(ol.dl)
+    results["search_data_cached"] = timed(cached.search_data, queries)
+    results["inventory_analysis_cached"] = timed(cached.inventory_analysis, [()] * max(20, ops // 10))
+
+    restocks = []
+    for product in sample:
+        restocks.append((rnd.randint(1, 50), product.ID))
+    results["add_stocks"] = timed(ol.add_stocks, restocks)
+
+    filter_ops = max(20, ops // 10)
+    results["price_filter"] = timed(ol.range_query, [("price", rnd.uniform(50, 400), None) for _ in range(filter_ops)])
+    results["stock_filter"] = timed(ol.range_query, [("stock", None, rnd.randint(0, 10)) for _ in range(filter_ops)])
+    subsets = [ol.search_data(query[0]) or [] for query in queries[:filter_ops]]
+    results["subset_filter"] = timed(ol.filter_range, [("price", None, rnd.uniform(5, 50), subset)
+                                                       for subset in subsets])
+
+    results["peak_rss_kb"] = peak_rss_kb()
+    ol.dl.close()
+    if trace_memory:
+        results["traced_peak_bytes"] = traced_build_peak(backend, workdir, size, seed)
+    return results
+
+
+def compare(current, baseline, threshold):
+    regressions = []
+    print(f"{'size':>9} {'operation':<20} {'baseline ops/s':>15} {'current ops/s':>15} {'change':>8}")
+    for size, operations in current["results"].items():
+        for name, stats in operations.items():
+            old = baseline.get("results", {}).get(size, {}).get(name)
+            if not isinstance(stats, dict) or not isinstance(old, dict) or not old.get("throughput"):
+                continue
+            change = stats["throughput"] / old["throughput"] - 1
+            flag = " <" if change < -threshold else ""
+            print(f"{size:>9} {name:<20} {old['throughput']:>15.1f} {stats['throughput']:>15.1f} {change:>+8.1%}{flag}")
+            if flag:
+                regressions.append((size, name, change))
+    return regressions
+
+
+def main_cli(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark OperationLayer operations on synthetic inventories")
+    parser.add_argument("--sizes", default="10000,100000,1000000", help="comma separated inventory sizes")
+    parser.add_argument("--ops", type=int, default=1000, help="timed operations per benchmark")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--backend", choices=["memory", "columnar", "sqlite", "sharded"], default="memory")
+    parser.add_argument("--trace-memory", action="store_true", help="rebuild each inventory under tracemalloc")
+    parser.add_argument("--output", help="write the JSON results to this file instead of stdout")
+    parser.add_argument("--baseline", help="JSON results to compare against")
+    parser.add_argument("--threshold", type=float, default=0.10, help="throughput drop reported as a regression")
+    args = parser.parse_args(argv)
+
+    report = {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "backend": args.backend,
+            "ops": args.ops,
+            "seed": args.seed,
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "results": {},
+    }
+    with tempfile.TemporaryDirectory() as workdir:
+        for size in (int(value) for value in args.sizes.split(",")):
+            print(f"Benchmarking {size} products ({args.backend})...", file=sys.stderr)
+            report["results"][str(size)] = run_size(args.backend, workdir, size, args.ops, args.seed,
+                                                    args.trace_memory)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as output:
+            json.dump(report, output, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as baseline_file:
+            regressions = compare(report, json.load(baseline_file), args.threshold)
+        if regressions:
+            print(f"{len(regressions)} regression(s) beyond {args.threshold:.0%}", file=sys.stderr)
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
@@ -1,6 +1,13 @@
-from collections import namedtuple, defaultdict, Counter
-from logging.handlers import RotatingFileHandler
-import os, logging
+from collections import namedtuple, defaultdict, Counter, OrderedDict
+from bisect import bisect_left, bisect_right, insort
+from collections.abc import Mapping, ValuesView, ItemsView
+from operator import itemgetter, attrgetter
+from array import array
+from contextlib import contextmanager
+from itertools import islice, groupby, chain
+from logging.handlers import RotatingFileHandler, QueueHandler, QueueListener
+import os, sys, logging, sqlite3, json, threading, time, csv, queue, atexit, heapq, multiprocessing, zlib, mmap, struct
+import analytics
 
 file_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "ProductInventoryLogs.log")
 log_handler = RotatingFileHandler(
@@ -10,50 +17,2910 @@ log_handler = RotatingFileHandler(
     encoding="utf-8"
 )
 log_handler.setFormatter(logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s"))
-logging.basicConfig(level=logging.DEBUG,
-                    handlers=[log_handler])
 
 
-class DataLayer:
+class DeferredQueueHandler(QueueHandler):
+    def prepare(self, record):
+        return record
+
+
+log_queue = queue.SimpleQueue()
+log_listener = QueueListener(log_queue, log_handler, respect_handler_level=True)
+log_level = os.environ.get("AIMS_LOG_LEVEL", "WARNING").upper()
+logging.basicConfig(level=log_level if isinstance(logging.getLevelName(log_level), int) else logging.WARNING,
+                    handlers=[DeferredQueueHandler(log_queue)])
+log_listener.start()
+atexit.register(log_listener.stop)
+if not isinstance(logging.getLevelName(log_level), int):
+    logging.warning("Unknown AIMS_LOG_LEVEL [%s] | Falling back to WARNING", log_level)
+
+PRODUCT_COLUMNS = "ID, name, company, category, sub_category, price, stock"
+PRODUCT_FIELDS = ["ID", "name", "company", "category", "sub_category", "price", "stock"]
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS products (
+    ID TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    company TEXT NOT NULL,
+    category TEXT NOT NULL,
+    sub_category TEXT NOT NULL,
+    price REAL NOT NULL,
+    stock INTEGER NOT NULL
+);
+DROP INDEX IF EXISTS products_name;
+DROP INDEX IF EXISTS products_price;
+DROP INDEX IF EXISTS products_stock;
+CREATE INDEX IF NOT EXISTS products_name_id ON products (name, ID);
+CREATE INDEX IF NOT EXISTS products_company ON products (company);
+CREATE INDEX IF NOT EXISTS products_category ON products (category);
+CREATE INDEX IF NOT EXISTS products_sub_category ON products (sub_category);
+CREATE INDEX IF NOT EXISTS products_price_id ON products (price, ID);
+CREATE INDEX IF NOT EXISTS products_stock_id ON products (stock, ID);
+CREATE TABLE IF NOT EXISTS id_counters (
+    prefix TEXT PRIMARY KEY,
+    next_counter INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS reorder_points (
+    scope TEXT NOT NULL,
+    key TEXT NOT NULL,
+    threshold INTEGER NOT NULL,
+    PRIMARY KEY (scope, key)
+);
+"""
+SNAPSHOT_MAGIC = b"AIMSMAP\0"
+SNAPSHOT_VERSION = 1
+SNAPSHOT_HEADER = struct.Struct("<8sIIQQ")
+SNAPSHOT_SECTION = struct.Struct("<16sQQ")
+
+
+class ReadWriteLock:
     def __init__(self):
-        self.Product = namedtuple(
-            "Product", [
-                "ID", "name",
-                "company", "category",
-                "sub_category", "price",
-                "stock"
-            ]
-        )
+        self.cond = threading.Condition(threading.Lock())
+        self.readers = 0
+        self.writer = None
+        self.write_depth = 0
+        self.waiting_writers = 0
+        self.local = threading.local()
+
+    def acquire_read(self):
+        depth = getattr(self.local, "read_depth", 0)
+        if depth or self.writer == threading.get_ident():
+            self.local.read_depth = depth + 1
+            return
+        with self.cond:
+            while self.writer is not None or self.waiting_writers:
+                self.cond.wait()
+            self.readers += 1
+        self.local.read_depth = 1
+        self.local.counted = True
+
+    def release_read(self):
+        self.local.read_depth -= 1
+        if self.local.read_depth or not getattr(self.local, "counted", False):
+            return
+        self.local.counted = False
+        with self.cond:
+            self.readers -= 1
+            if not self.readers:
+                self.cond.notify_all()
+
+    def acquire_write(self):
+        me = threading.get_ident()
+        if self.writer == me:
+            self.write_depth += 1
+            return
+        with self.cond:
+            self.waiting_writers += 1
+            while self.writer is not None or self.readers:
+                self.cond.wait()
+            self.waiting_writers -= 1
+            self.writer = me
+            self.write_depth = 1
+
+    def release_write(self):
+        self.write_depth -= 1
+        if self.write_depth:
+            return
+        with self.cond:
+            self.writer = None
+            self.cond.notify_all()
+
+    @contextmanager
+    def read_locked(self):
+        self.acquire_read()
+        try:
+            yield
+        finally:
+            self.release_read()
+
+    @contextmanager
+    def write_locked(self):
+        self.acquire_write()
+        try:
+            yield
+        finally:
+            self.release_write()
+
+
+def edit_distance(source, target, limit):
+    if abs(len(source) - len(target)) > limit:
+        return limit + 1
+    before_previous, previous = None, list(range(len(target) + 1))
+    for i, source_char in enumerate(source, 1):
+        current = [i] + [0] * len(target)
+        for j, target_char in enumerate(target, 1):
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (source_char != target_char))
+            if i > 1 and j > 1 and source_char == target[j - 2] and source[i - 2] == target_char:
+                current[j] = min(current[j], before_previous[j - 2] + 1)
+        if min(current) > limit:
+            return limit + 1
+        before_previous, previous = previous, current
+    return previous[-1]
+
+
+def merge_suggestions(suggestion_lists, limit):
+    merged = {}
+    for suggestions in suggestion_lists:
+        for term, distance, count in suggestions:
+            key = term.casefold()
+            if key in merged:
+                merged[key] = (distance, merged[key][1] + count, merged[key][2])
+            else:
+                merged[key] = (distance, count, term)
+    ranked = heapq.nsmallest(limit, merged.values(), key=lambda s: (s[0], -s[1], s[2]))
+    return [(term, distance, count) for distance, count, term in ranked]
+
+
+def page_of_keys(keys, cursor, descending, limit):
+    if descending:
+        end = len(keys) if cursor is None else bisect_left(keys, cursor)
+        return keys[max(0, end - limit):end][::-1]
+    start = 0 if cursor is None else bisect_right(keys, cursor)
+    return keys[start:start + limit]
+
+
+class FuzzyIndex:
+    def __init__(self, max_distance=2, prefix_length=7):
+        self.max_distance = max_distance
+        self.prefix_length = prefix_length
+        self.terms = Counter()
+        self.spellings = {}
+        self.deletes = defaultdict(set)
+
+    def variants(self, word, distance):
+        found, edge = {word}, {word}
+        for _ in range(distance):
+            edge = {variant[:i] + variant[i + 1:] for variant in edge if len(variant) > 1
+                    for i in range(len(variant))} - found
+            found |= edge
+        return found
+
+    def add(self, term):
+        key = term.casefold()
+        if key not in self.terms:
+            self.spellings[key] = term
+            for variant in self.variants(key[:self.prefix_length], self.max_distance):
+                self.deletes[variant].add(key)
+        self.terms[key] += 1
+
+    def add_terms(self, name, *facet_values):
+        for term in {*name.split(), *facet_values}:
+            self.add(term)
+
+    def lookup(self, text, limit=5):
+        key = text.strip().casefold()
+        if not key:
+            return []
+        max_distance = min(self.max_distance, max(1, len(key) // 3))
+        candidates = set()
+        for variant in self.variants(key[:self.prefix_length], max_distance):
+            candidates.update(self.deletes.get(variant, ()))
+        ranked = []
+        for term in candidates:
+            distance = edit_distance(key, term, max_distance)
+            if distance <= max_distance:
+                ranked.append((distance, -self.terms[term], term))
+        return [(self.spellings[term], distance, -count) for distance, count, term in heapq.nsmallest(limit, ranked)]
+
+
+class PrefixIndex:
+    def __init__(self):
+        self.keys = []
+        self.counts = Counter()
+
+    def add(self, value, count=1):
+        if value not in self.counts:
+            insort(self.keys, (value.casefold(), value))
+        self.counts[value] += count
+
+    def bounds(self, prefix):
+        folded = prefix.casefold()
+        return bisect_left(self.keys, (folded,)), bisect_left(self.keys, (folded + "\U0010ffff",))
+
+    def matches(self, prefix=""):
+        start, end = self.bounds(prefix)
+        return [(value, self.counts[value]) for _, value in self.keys[start:end]]
+
+    def page(self, prefix="", offset=0, limit=10):
+        start, end = self.bounds(prefix)
+        offset = max(0, offset)
+        return end - start, [(value, self.counts[value])
+                             for _, value in self.keys[start + offset:min(end, start + offset + limit)]]
+
+
+class BaseDataLayer:
+    Product = namedtuple("Product", PRODUCT_FIELDS)
+
+    def code_of(self, value):
+        return value
+
+    def decode(self, code):
+        return code
 
+    def product_code(self, product, attribute):
+        return getattr(product, attribute)
+
+    def bump(self, *index_names):
+        for index_name in index_names:
+            self.generations[index_name] += 1
+
+    def stamp(self, index_names):
+        return tuple(self.generations[index_name] for index_name in index_names)
+
+    def track_id(self, i_d):
+        counter, prefix = i_d[:-3], i_d[-3:]
+        if counter.isdigit():
+            self.id_counters[prefix] = max(self.id_counters.get(prefix, 1), int(counter) + 1)
+
+    def threshold_of(self, product):
+        threshold = self.sku_thresholds.get(product.ID)
+        if threshold is None:
+            threshold = self.category_thresholds.get(self.product_code(product, "category"), self.low_stock_limit)
+        return threshold
+
+    def note_crossing(self, old_stock, product):
+        if not self.stock_listeners:
+            return
+        threshold = self.threshold_of(product)
+        was_low = old_stock is not None and old_stock < threshold
+        if (product.stock < threshold) != was_low:
+            self.pending_events.append(("restocked" if was_low else "low", product, threshold))
+
+    def add_stock_listener(self, callback):
+        self.stock_listeners.append(callback)
+
+    def fire_events(self):
+        if not self.pending_events:
+            return
+        with self.write_locked():
+            events, self.pending_events = self.pending_events, []
+        for event, product, threshold in events:
+            for callback in self.stock_listeners:
+                try:
+                    callback(event, product, threshold)
+                except Exception:
+                    logging.exception("Stock listener failed on [%s] event for [%s]", event, product.ID)
+
+
+class DataLayer(BaseDataLayer):
+    def __init__(self, id_width=4):
         self.products = {}
-        self.products_names = set()
-        self.category = defaultdict(list)
-        self.sub_category = defaultdict(list)
-        self.company = defaultdict(list)
+        self.name_index = defaultdict(list)
+        self.category = defaultdict(set)
+        self.sub_category = defaultdict(set)
+        self.company = defaultdict(set)
+        self.all_search_fields = {
+            "Company": self.company,
+            "Category": self.category,
+            "Sub-Category": self.sub_category
+        }
+        self.facet_attributes = {
+            "Company": "company",
+            "Category": "category",
+            "Sub-Category": "sub_category"
+        }
+        self.strings = []
+        self.string_codes = {}
+        self.generations = dict.fromkeys(("Company", "Category", "Sub-Category", "name", "price", "stock"), 0)
+        self.gram_size = 3
+        self.name_grams = defaultdict(set)
+        self.fuzzy = FuzzyIndex()
+        self.facet_prefixes = {field: PrefixIndex() for field in self.all_search_fields}
+        self.price_index = []
+        self.stock_index = []
+        self.sorted_fields = {
+            "price": self.price_index,
+            "stock": self.stock_index
+        }
+        self.sort_keys = {}
+        self.low_stock_limit = 10
+        self.category_count = Counter()
+        self.sub_category_count = Counter()
+        self.company_count = Counter()
+        self.category_stock = Counter()
+        self.category_thresholds = {}
+        self.sku_thresholds = {}
+        self.low_stock = set()
+        self.stock_listeners = []
+        self.pending_events = []
+        self.id_width = id_width
+        self.id_counters = {}
+        self.lock = ReadWriteLock()
+
+
+    def read_locked(self):
+        return self.lock.read_locked()
+
+    def write_locked(self):
+        return self.lock.write_locked()
+
+    def add_product(self, product_data):
+        with self.write_locked():
+            new_product = self.index_product(product_data)
+            self.sorted_insert("price", new_product.price, new_product.ID)
+            self.sorted_insert("stock", new_product.stock, new_product.ID)
+        self.fire_events()
+        if logging.root.isEnabledFor(logging.INFO):
+            logging.info("Product Added successfully [ID: %s | Name: %s]\n", new_product.ID, new_product.name)
+
+    def add_products(self, batch):
+        with self.write_locked():
+            new_products = [self.index_product(product_data) for product_data in batch]
+            self.sorted_extend("price", [(p.price, p.ID) for p in new_products])
+            self.sorted_extend("stock", [(p.stock, p.ID) for p in new_products])
+        self.fire_events()
+        logging.info("Batch of [%s] product(s) added successfully\n", len(new_products))
+        return len(new_products)
+
+    def encode(self, value):
+        code = self.string_codes.get(value)
+        if code is None:
+            code = len(self.strings)
+            self.strings.append(sys.intern(value))
+            self.string_codes[value] = code
+        return code
+
+    def code_of(self, value):
+        return self.string_codes.get(value)
+
+    def decode(self, code):
+        return self.strings[code]
+
+    def product_code(self, product, attribute):
+        return self.string_codes[getattr(product, attribute)]
+
+    def store_product(self, product_data, codes):
+        company, category, sub_category = codes
+        new_product = self.Product(product_data["ID"], product_data["name"],
+                              self.strings[company], self.strings[category],
+                              self.strings[sub_category], product_data["price"],
+                              product_data["stock"])
+        self.products[new_product.ID] = new_product
+        return new_product
+
+    def store_stock(self, key, product, stock):
+        self.products[key] = product._replace(stock=stock)
+        return self.products[key]
+
+    def sorted_insert(self, field, value, key):
+        insort(self.sorted_fields[field], (value, key))
+
+    def sorted_remove(self, field, value, key):
+        index = self.sorted_fields[field]
+        del index[bisect_left(index, (value, key))]
+
+    def sorted_extend(self, field, pairs):
+        index = self.sorted_fields[field]
+        merged, start = [], 0
+        for pair in sorted(pairs):
+            end = bisect_left(index, pair, start)
+            merged.extend(index[start:end])
+            merged.append(pair)
+            start = end
+        merged.extend(index[start:])
+        index[:] = merged
+
+    def index_product(self, product_data):
+        company, category, sub_category = codes = (self.encode(product_data["company"]),
+                                                   self.encode(product_data["category"]),
+                                                   self.encode(product_data["sub_category"]))
+        new_product = self.store_product(product_data, codes)
+        self.track_id(new_product.ID)
+        self.add_postings(new_product, codes)
+        self.fuzzy.add_terms(new_product.name, new_product.company, new_product.category, new_product.sub_category)
+        for field, attribute in self.facet_attributes.items():
+            self.facet_prefixes[field].add(getattr(new_product, attribute))
+        self.company_count[company] += 1
+        self.category_count[category] += 1
+        self.sub_category_count[sub_category] += 1
+        self.category_stock[category] += new_product.stock
+        self.track_low_stock(new_product)
+        self.bump(*self.generations)
+        return new_product
+
+    def add_postings(self, product, codes):
+        company, category, sub_category = codes
+        self.name_index[product.name].append(product.ID)
+        self.company[company].add(product.ID)
+        self.category[category].add(product.ID)
+        self.sub_category[sub_category].add(product.ID)
+        for gram in self.grams_of(product.name):
+            self.name_grams[gram].add(product.ID)
+
+    def get_product(self):
+        logging.debug("Returning Product Dictionary (self.products)")
+        return self.products
+
+    def reserve_id_counter(self, prefix):
+        with self.write_locked():
+            counter = self.id_counters.get(prefix, 1)
+            self.id_counters[prefix] = counter + 1
+            return counter
+
+    def update_stock(self, key, stock):
+        with self.write_locked():
+            product = self.set_stock(key, stock)
+        self.fire_events()
+        return product
+
+    def adjust_stock(self, key, delta):
+        with self.write_locked():
+            product = self.products.get(key)
+            if product is None:
+                logging.warning("No product with ID [%s] | Stock not adjusted", key)
+                return None
+            if product.stock + delta < 0:
+                logging.warning("Stock of [%s] cannot go below zero [%s %+d] | Stock not adjusted",
+                                key, product.stock, delta)
+                return None
+            product = self.set_stock(key, product.stock + delta)
+        self.fire_events()
+        return product
+
+    def update_stocks(self, new_stocks):
+        with self.write_locked():
+            updated = self.set_stocks(new_stocks)
+        self.fire_events()
+        return updated
+
+    def apply_stock_deltas(self, deltas):
+        with self.write_locked():
+            new_stocks = {}
+            for key, delta in deltas.items():
+                product = self.products.get(key)
+                if product is None or product.stock + delta < 0:
+                    logging.warning("Stock movement on [%s] rejected | Missing product or stock below zero", key)
+                    return None
+                new_stocks[key] = product.stock + delta
+            self.set_stocks(new_stocks)
+        self.fire_events()
+        return new_stocks
+
+    def set_stock(self, key, stock):
+        return self.set_stocks({key: stock})[key]
+
+    def set_stocks(self, new_stocks):
+        rebuild = len(new_stocks) > max(64, len(self.products) // 16)
+        log_debug = logging.root.isEnabledFor(logging.DEBUG)
+        updated = {}
+        for key, stock in new_stocks.items():
+            product = self.products[key]
+            old_stock = product.stock
+            if not rebuild:
+                self.sorted_remove("stock", old_stock, key)
+                self.sorted_insert("stock", stock, key)
+            self.category_stock[self.product_code(product, "category")] += stock - old_stock
+            if log_debug:
+                logging.debug("Stock index updated [ID: %s | %s -> %s]", key, old_stock, stock)
+            updated[key] = self.store_stock(key, product, stock)
+            self.track_low_stock(updated[key])
+        if rebuild:
+            self.sorted_rebuild("stock")
+        self.bump("stock")
+        return updated
+
+    def sorted_rebuild(self, field):
+        self.sorted_fields[field][:] = sorted((getattr(p, field), p.ID) for p in self.products.values())
+        logging.debug("Rebuilt the [%s] index", field)
+
+    def track_low_stock(self, product):
+        threshold = self.threshold_of(product)
+        is_low = product.stock < threshold
+        if is_low == (product.ID in self.low_stock):
+            return
+        if is_low:
+            self.low_stock.add(product.ID)
+        else:
+            self.low_stock.discard(product.ID)
+        if self.stock_listeners:
+            self.pending_events.append(("low" if is_low else "restocked", product, threshold))
+
+    def set_reorder_threshold(self, threshold, category=None, i_d=None):
+        with self.write_locked():
+            if i_d is not None:
+                overrides, key = self.sku_thresholds, i_d
+                affected = [i_d] if i_d in self.products else []
+            elif category is not None:
+                overrides, key = self.category_thresholds, self.encode(category)
+                affected = list(self.category.get(key, ()))
+            else:
+                overrides, key = None, None
+                self.low_stock_limit = threshold
+                affected = list(self.products)
+            if overrides is not None:
+                if threshold is None:
+                    overrides.pop(key, None)
+                else:
+                    overrides[key] = threshold
+            for p_id in affected:
+                self.track_low_stock(self.products[p_id])
+            self.bump("stock")
+        self.fire_events()
+        logging.info("Reorder threshold set to [%s] | Category: %s | ID: %s | Products re-checked: %s",
+                     threshold, category, i_d, len(affected))
+        return len(affected)
+
+    def low_stock_products(self):
+        with self.read_locked():
+            return sorted(self.fetch_products(self.low_stock), key=attrgetter("stock"))
+
+    def analysis_snapshot(self):
+        logging.debug("Reading running aggregates")
+        with self.read_locked():
+            low_stocks_full = {}
+            for p_id in self.low_stock:
+                product = self.products[p_id]
+                low_stocks_full[product.name] = product.stock
+            avg_stocks_per_category = {self.strings[k]: self.category_stock[k] / v
+                                       for k, v in self.category_count.items()}
+            return (self.decode_counts(self.category_count), self.decode_counts(self.sub_category_count),
+                    self.decode_counts(self.company_count), len(self.low_stock), low_stocks_full,
+                    avg_stocks_per_category)
+
+    def decode_counts(self, counts):
+        return Counter({self.strings[code]: count for code, count in counts.items()})
+
+    def range_bounds(self, field, lo=None, hi=None):
+        index = self.sorted_fields[field]
+        start = 0 if lo is None else bisect_left(index, lo, key=itemgetter(0))
+        end = len(index) if hi is None else bisect_right(index, hi, key=itemgetter(0))
+        return index, start, max(start, end)
+
+    def range_count(self, field, lo=None, hi=None):
+        with self.read_locked():
+            _, start, end = self.range_bounds(field, lo, hi)
+        return end - start
+
+    def range_ids(self, field, lo=None, hi=None):
+        with self.read_locked():
+            index, start, end = self.range_bounds(field, lo, hi)
+            return [p_id for _, p_id in index[start:end]]
+
+    def range_products(self, field, lo=None, hi=None):
+        with self.read_locked():
+            return self.fetch_products(self.range_ids(field, lo, hi))
+
+    def sort_keys_of(self, sort_by):
+        generation = self.generations["name"]
+        cached = self.sort_keys.get(sort_by)
+        if cached is None or cached[0] != generation:
+            logging.debug("Building the [%s] sort keys", sort_by)
+            cached = self.sort_keys[sort_by] = (generation, sorted((getattr(p, sort_by), p.ID)
+                                                                   for p in self.products.values()))
+        return cached[1]
+
+    def page_products(self, sort_by, descending=False, cursor=None, limit=50):
+        with self.read_locked():
+            keys = self.sorted_fields[sort_by] if sort_by in self.sorted_fields else self.sort_keys_of(sort_by)
+            return self.fetch_products([p_id for _, p_id in page_of_keys(keys, cursor, descending, limit)])
+
+    def fetch_products(self, ids):
+        with self.read_locked():
+            return [self.products[p_id] for p_id in ids]
+
+    def search_ids(self, term):
+        log_debug = logging.root.isEnabledFor(logging.DEBUG)
+        matching_ids = set()
+        with self.read_locked():
+            code = self.string_codes.get(term)
+            for field, index in self.all_search_fields.items():
+                if code is not None and code in index:
+                    if log_debug:
+                        logging.debug("[%s] Found in Product %s", term, field)
+                    matching_ids.update(index[code])
+            name_ids = self.search_names(term)
+        if name_ids:
+            if log_debug:
+                logging.debug("[%s] Found in Product Names", term)
+            matching_ids.update(name_ids)
+        return matching_ids
+
+    def suggest_terms(self, term, limit=5):
+        with self.read_locked():
+            return self.fuzzy.lookup(term, limit)
+
+    def facet_page(self, field, prefix="", offset=0, limit=10):
+        with self.read_locked():
+            return self.facet_prefixes[field].page(prefix, offset, limit)
+
+    def facet_matches(self, field, prefix=""):
+        with self.read_locked():
+            return self.facet_prefixes[field].matches(prefix)
+
+    def name_estimate(self, term):
+        if len(term) < self.gram_size:
+            return len(self.products)
+        return min(len(self.name_grams.get(gram, ())) for gram in self.grams_of(term))
+
+    def plan_query(self, facets, name, ranges):
+        sources = []
+        for field, value in facets.items():
+            code = self.string_codes.get(value)
+            posting = self.all_search_fields[field].get(code) if code is not None else None
+            if not posting:
+                logging.debug("No products for [%s = %s] | Empty result", field, value)
+                return [], []
+            sources.append((len(posting), "facet", posting))
+        if name is not None:
+            sources.append((self.name_estimate(name), "name", name))
+        for field, (lo, hi) in ranges.items():
+            sources.append((self.range_count(field, lo, hi), "range", (field, lo, hi)))
+
+        if not sources:
+            return list(self.products), []
+
+        sources.sort(key=itemgetter(0))
+        size, kind, driver = sources[0]
+        if logging.root.isEnabledFor(logging.DEBUG):
+            logging.debug("Query plan | Driver: %s (~%s) | Then: %s", kind, size, [k for _, k, _ in sources[1:]])
+        if kind == "facet":
+            candidates = list(driver)
+        elif kind == "name":
+            candidates = self.search_names(driver)
+        else:
+            candidates = self.range_ids(*driver)
+        return candidates, [source for _, kind, source in sources[1:] if kind == "facet"]
+
+    def query_products(self, facets, name=None, ranges=None):
+        ranges = ranges or {}
+        with self.read_locked():
+            candidates, postings = self.plan_query(facets, name, ranges)
+
+        for p_id in candidates:
+            if not all(p_id in posting for posting in postings):
+                continue
+            product = self.products[p_id]
+            if name is not None and name not in product.name:
+                continue
+            if all((lo is None or getattr(product, field) >= lo) and (hi is None or getattr(product, field) <= hi)
+                   for field, (lo, hi) in ranges.items()):
+                yield product
+
+    def flush(self):
+        logging.debug("In-memory DataLayer has nothing to flush")
+
+    def close(self):
+        logging.debug("In-memory DataLayer has nothing to close")
+
+    def grams_of(self, text):
+        if len(text) < self.gram_size:
+            return {text}
+        return {text[i:i + self.gram_size] for i in range(len(text) - self.gram_size + 1)}
+
+    def search_names(self, term):
+        with self.read_locked():
+            if len(term) < self.gram_size:
+                logging.debug("Short term [%s] | Scanning gram keys", term)
+                matching_ids = set()
+                for gram, ids in self.name_grams.items():
+                    if term in gram:
+                        matching_ids.update(ids)
+                return matching_ids
+
+            postings = sorted((self.name_grams.get(gram, set()) for gram in self.grams_of(term)), key=len)
+            candidates = set(postings[0])
+            for posting in postings[1:]:
+                if not candidates:
+                    break
+                candidates.intersection_update(posting)
+            if logging.root.isEnabledFor(logging.DEBUG):
+                logging.debug("[%s] Candidate(s) left after intersecting grams of [%s]", len(candidates), term)
+            return {p_id for p_id in candidates if term in self.products[p_id].name}
+
+
+class StreamingValuesView(ValuesView):
+    def __iter__(self):
+        return self._mapping.iter_values()
+
+
+class StreamingItemsView(ItemsView):
+    def __iter__(self):
+        return self._mapping.iter_items()
+
+
+class ProductRow:
+    __slots__ = ("store", "row")
+    _fields = ("ID", "name", "company", "category", "sub_category", "price", "stock")
+
+    def __init__(self, store, row):
+        self.store = store
+        self.row = row
+
+    @property
+    def ID(self):
+        return self.store.ids[self.row]
+
+    @property
+    def name(self):
+        return self.store.names[self.row]
+
+    @property
+    def company(self):
+        return self.store.strings[self.store.companies[self.row]]
+
+    @property
+    def category(self):
+        return self.store.strings[self.store.categories[self.row]]
+
+    @property
+    def sub_category(self):
+        return self.store.strings[self.store.sub_categories[self.row]]
+
+    @property
+    def price(self):
+        return self.store.prices[self.row]
+
+    @property
+    def stock(self):
+        return self.store.stocks[self.row]
+
+    def __iter__(self):
+        return iter((self.ID, self.name, self.company, self.category, self.sub_category, self.price, self.stock))
+
+    def __getitem__(self, index):
+        return tuple(self)[index]
+
+    def __len__(self):
+        return len(self._fields)
+
+    def __eq__(self, other):
+        if not isinstance(other, (ProductRow, tuple, list)):
+            return NotImplemented
+        return tuple(self) == tuple(other)
+
+    def __lt__(self, other):
+        if not isinstance(other, (ProductRow, tuple, list)):
+            return NotImplemented
+        return tuple(self) < tuple(other)
+
+    def __hash__(self):
+        return hash(self.ID)
+
+    def __repr__(self):
+        return "Product(" + ", ".join(f"{k}={v!r}" for k, v in zip(self._fields, self)) + ")"
+
+    def _asdict(self):
+        return dict(zip(self._fields, self))
+
+    def _replace(self, **changes):
+        return self.store.Product(**{**self._asdict(), **changes})
+
+
+class ColumnStore(Mapping):
+    def __init__(self, product_type, strings):
+        self.Product = product_type
+        self.strings = strings
+        self.rows = {}
+        self.ids = []
+        self.names = []
+        self.companies = array("I")
+        self.categories = array("I")
+        self.sub_categories = array("I")
+        self.prices = array("d")
+        self.stocks = array("q")
+        self.code_columns = {
+            "company": self.companies,
+            "category": self.categories,
+            "sub_category": self.sub_categories
+        }
+
+    def append(self, product_data, codes):
+        company, category, sub_category = codes
+        i_d = product_data["ID"]
+        if i_d in self.rows:
+            row = self.rows[i_d]
+            self.names[row] = product_data["name"]
+            self.companies[row] = company
+            self.categories[row] = category
+            self.sub_categories[row] = sub_category
+            self.prices[row] = product_data["price"]
+            self.stocks[row] = product_data["stock"]
+            return ProductRow(self, row)
+
+        row = len(self.ids)
+        self.rows[i_d] = row
+        self.ids.append(i_d)
+        self.names.append(product_data["name"])
+        self.companies.append(company)
+        self.categories.append(category)
+        self.sub_categories.append(sub_category)
+        self.prices.append(product_data["price"])
+        self.stocks.append(product_data["stock"])
+        return ProductRow(self, row)
+
+    def __getitem__(self, key):
+        return ProductRow(self, self.rows[key])
+
+    def __contains__(self, key):
+        return key in self.rows
+
+    def __iter__(self):
+        return iter(self.ids)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def values(self):
+        return StreamingValuesView(self)
+
+    def items(self):
+        return StreamingItemsView(self)
+
+    def iter_values(self):
+        for row in range(len(self.ids)):
+            yield ProductRow(self, row)
+
+    def iter_items(self):
+        for row, i_d in enumerate(self.ids):
+            yield i_d, ProductRow(self, row)
+
+
+class RowPostings(Mapping):
+    def __init__(self, ids):
+        self.ids = ids
+        self.rows = {}
+
+    def add(self, key, row):
+        posting = self.rows.get(key)
+        if posting is None:
+            self.rows[key] = array("I", (row,))
+        elif row > posting[-1] or row not in posting:
+            posting.append(row)
+
+    def __getitem__(self, key):
+        ids = self.ids
+        return [ids[row] for row in self.rows[key]]
+
+    def __contains__(self, key):
+        return key in self.rows
+
+    def __iter__(self):
+        return iter(self.rows)
+
+    def __len__(self):
+        return len(self.rows)
+
+
+class ColumnarDataLayer(DataLayer):
+    def __init__(self, id_width=4):
+        super().__init__(id_width)
+        self.products = ColumnStore(self.Product, self.strings)
+        self.name_index = RowPostings(self.products.ids)
+        self.category = RowPostings(self.products.ids)
+        self.sub_category = RowPostings(self.products.ids)
+        self.company = RowPostings(self.products.ids)
+        self.all_search_fields = {
+            "Company": self.company,
+            "Category": self.category,
+            "Sub-Category": self.sub_category
+        }
+        self.name_grams = RowPostings(self.products.ids)
+        self.sorted_fields = {
+            "price": (array("d"), array("q")),
+            "stock": (array("q"), array("q"))
+        }
+        self.sorted_pending = {
+            "price": [],
+            "stock": []
+        }
+
+    def store_product(self, product_data, codes):
+        return self.products.append(product_data, codes)
+
+    def add_postings(self, product, codes):
+        row = product.row
+        self.name_index.add(product.name, row)
+        for index, code in zip((self.company, self.category, self.sub_category), codes):
+            index.add(code, row)
+        for gram in self.grams_of(product.name):
+            self.name_grams.add(gram, row)
+
+    def name_estimate(self, term):
+        if len(term) < self.gram_size:
+            return len(self.products)
+        return min(len(self.name_grams.rows.get(gram, ())) for gram in self.grams_of(term))
+
+    def search_name_rows(self, term):
+        grams = self.name_grams.rows
+        if len(term) < self.gram_size:
+            logging.debug("Short term [%s] | Scanning gram keys", term)
+            rows = set()
+            for gram, posting in grams.items():
+                if term in gram:
+                    rows.update(posting)
+            return rows
+
+        postings = sorted((grams.get(gram, ()) for gram in self.grams_of(term)), key=len)
+        candidates = set(postings[0])
+        for posting in postings[1:]:
+            if not candidates:
+                break
+            candidates.intersection_update(posting)
+        names = self.products.names
+        return {row for row in candidates if term in names[row]}
+
+    def search_names(self, term):
+        with self.read_locked():
+            ids = self.products.ids
+            return {ids[row] for row in self.search_name_rows(term)}
+
+    def query_products(self, facets, name=None, ranges=None):
+        ranges = ranges or {}
+        store = self.products
+        with self.read_locked():
+            checks, sources = [], []
+            for field, value in facets.items():
+                code = self.string_codes.get(value)
+                posting = self.all_search_fields[field].rows.get(code) if code is not None else None
+                if not posting:
+                    logging.debug("No products for [%s = %s] | Empty result", field, value)
+                    return
+                checks.append((store.code_columns[self.facet_attributes[field]], code))
+                sources.append((len(posting), "facet", posting))
+            if name is not None:
+                sources.append((self.name_estimate(name), "name", name))
+            for field, (lo, hi) in ranges.items():
+                sources.append((self.range_count(field, lo, hi), "range", (field, lo, hi)))
+
+            if not sources:
+                candidates = range(len(store))
+            else:
+                sources.sort(key=itemgetter(0))
+                _, kind, driver = sources[0]
+                if kind == "facet":
+                    candidates = array("I", driver)
+                elif kind == "name":
+                    candidates = sorted(self.search_name_rows(driver))
+                else:
+                    rows, start, end = self.range_bounds(*driver)
+                    candidates = rows[start:end]
+
+        columns = {"price": store.prices, "stock": store.stocks}
+        for row in candidates:
+            if not all(column[row] == code for column, code in checks):
+                continue
+            if name is not None and name not in store.names[row]:
+                continue
+            if all((lo is None or columns[field][row] >= lo) and (hi is None or columns[field][row] <= hi)
+                   for field, (lo, hi) in ranges.items()):
+                yield ProductRow(store, row)
+
+    def product_code(self, product, attribute):
+        return self.products.code_columns[attribute][product.row]
+
+    def store_stock(self, key, product, stock):
+        self.products.stocks[product.row] = stock
+        return product
+
+    @contextmanager
+    def read_locked(self):
+        while True:
+            if any(self.sorted_pending.values()):
+                with self.write_locked():
+                    for field in self.sorted_pending:
+                        self.sorted_index(field)
+            with self.lock.read_locked():
+                if not any(self.sorted_pending.values()):
+                    yield
+                    return
+
+    def sorted_index(self, field):
+        keys, rows = self.sorted_fields[field]
+        pending = self.sorted_pending[field]
+        if pending:
+            ids = self.products.ids
+            order = lambda pair: (pair[0], ids[pair[1]])
+            pending.sort(key=order)
+            merged = list(heapq.merge(zip(keys, rows), pending, key=order))
+            keys[:] = array(keys.typecode, [key for key, _ in merged])
+            rows[:] = array("q", [row for _, row in merged])
+            pending.clear()
+            logging.debug("Merged pending entries into the [%s] column index", field)
+        return keys, rows
+
+    def sorted_insert(self, field, value, key):
+        keys, rows = self.sorted_index(field)
+        position = bisect_left(rows, key, bisect_left(keys, value), bisect_right(keys, value),
+                               key=self.products.ids.__getitem__)
+        keys.insert(position, value)
+        rows.insert(position, self.products.rows[key])
+
+    def sorted_remove(self, field, value, key):
+        keys, rows = self.sorted_index(field)
+        position = bisect_left(rows, key, bisect_left(keys, value), bisect_right(keys, value),
+                               key=self.products.ids.__getitem__)
+        del keys[position]
+        del rows[position]
+
+    def sorted_extend(self, field, pairs):
+        self.sorted_pending[field].extend((value, self.products.rows[key]) for value, key in pairs)
+
+    def sorted_rebuild(self, field):
+        keys, rows = self.sorted_fields[field]
+        column = self.products.prices if field == "price" else self.products.stocks
+        ids = self.products.ids
+        order = sorted(range(len(column)), key=lambda row: (column[row], ids[row]))
+        rows[:] = array("q", order)
+        keys[:] = array(keys.typecode, [column[row] for row in order])
+        self.sorted_pending[field].clear()
+        logging.debug("Rebuilt the [%s] column index", field)
+
+    def range_bounds(self, field, lo=None, hi=None):
+        keys, rows = self.sorted_index(field)
+        start = 0 if lo is None else bisect_left(keys, lo)
+        end = len(keys) if hi is None else bisect_right(keys, hi)
+        return rows, start, max(start, end)
+
+    def range_ids(self, field, lo=None, hi=None):
+        rows, start, end = self.range_bounds(field, lo, hi)
+        ids = self.products.ids
+        return [ids[row] for row in rows[start:end]]
+
+    def page_products(self, sort_by, descending=False, cursor=None, limit=50):
+        if sort_by not in self.sorted_fields:
+            return super().page_products(sort_by, descending, cursor, limit)
+        with self.read_locked():
+            keys, rows = self.sorted_fields[sort_by]
+            if cursor is None:
+                position = len(rows) if descending else 0
+            else:
+                value, i_d = cursor
+                find = bisect_left if descending else bisect_right
+                position = find(rows, i_d, bisect_left(keys, value), bisect_right(keys, value),
+                                key=self.products.ids.__getitem__)
+            selected = rows[max(0, position - limit):position][::-1] if descending else rows[position:position + limit]
+            return [ProductRow(self.products, row) for row in selected]
+
+
+class SQLiteProducts(Mapping):
+    def __init__(self, data_layer):
+        self.dl = data_layer
+
+    def __getitem__(self, key):
+        row = self.dl.fetch_one(f"SELECT {PRODUCT_COLUMNS} FROM products WHERE ID = ?", (key,))
+        if row is None:
+            raise KeyError(key)
+        return self.dl.Product(*row)
+
+    def __contains__(self, key):
+        return self.dl.fetch_one("SELECT 1 FROM products WHERE ID = ?", (key,)) is not None
+
+    def __iter__(self):
+        for (p_id,) in self.dl.iter_rows("ID"):
+            yield p_id
+
+    def __len__(self):
+        return self.dl.fetch_one("SELECT COUNT(*) FROM products")[0]
+
+    def __bool__(self):
+        return self.dl.fetch_one("SELECT 1 FROM products LIMIT 1") is not None
+
+    def values(self):
+        return StreamingValuesView(self)
+
+    def items(self):
+        return StreamingItemsView(self)
+
+    def iter_values(self):
+        for row in self.dl.iter_rows(PRODUCT_COLUMNS):
+            yield self.dl.Product(*row)
+
+    def iter_items(self):
+        for product in self.iter_values():
+            yield product.ID, product
+
+
+class SQLiteFacet(Mapping):
+    def __init__(self, data_layer, column):
+        self.dl = data_layer
+        self.column = column
+
+    def __getitem__(self, value):
+        ids = [p_id for (p_id,) in self.dl.fetch_all(
+            f"SELECT ID FROM products WHERE {self.column} = ?", (value,))]
+        if not ids:
+            raise KeyError(value)
+        return ids
+
+    def __contains__(self, value):
+        return self.dl.fetch_one(
+            f"SELECT 1 FROM products WHERE {self.column} = ? LIMIT 1", (value,)) is not None
+
+    def __iter__(self):
+        for (value,) in self.dl.fetch_all(f"SELECT DISTINCT {self.column} FROM products ORDER BY {self.column}"):
+            yield value
+
+    def __len__(self):
+        return self.dl.fetch_one(f"SELECT COUNT(DISTINCT {self.column}) FROM products")[0]
+
+
+class SQLiteDataLayer(BaseDataLayer):
+    def __init__(self, db_path, id_width=4, batch_size=1000):
+        self.db_lock = threading.RLock()
+        self.conn = sqlite3.connect(db_path, cached_statements=256, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SQLITE_SCHEMA)
+        self.name_search = self.create_name_search()
+        self.conn.commit()
+
+        self.products = SQLiteProducts(self)
+        self.category = SQLiteFacet(self, "category")
+        self.sub_category = SQLiteFacet(self, "sub_category")
+        self.company = SQLiteFacet(self, "company")
         self.all_search_fields = {
             "Company": self.company,
             "Category": self.category,
             "Sub-Category": self.sub_category
         }
+        self.facet_attributes = {
+            "Company": "company",
+            "Category": "category",
+            "Sub-Category": "sub_category"
+        }
+        self.name_index = SQLiteFacet(self, "name")
+        self.sorted_fields = {
+            "price": "price",
+            "stock": "stock"
+        }
+        self.generations = dict.fromkeys(("Company", "Category", "Sub-Category", "name", "price", "stock"), 0)
+        self.gram_size = 3
+        self.low_stock_limit = 10
+        self.category_thresholds = {}
+        self.sku_thresholds = {}
+        self.load_thresholds()
+        self.stock_listeners = []
+        self.pending_events = []
+        self.id_width = id_width
+        self.batch_size = batch_size
+        self.pending_writes = 0
+        self.fuzzy = None
+        self.facet_prefixes = {}
+        logging.info("SQLite DataLayer opened [%s] | Trigram name search: %s", db_path, self.name_search)
+
+    def create_name_search(self):
+        try:
+            self.conn.execute("CREATE VIRTUAL TABLE IF NOT EXISTS product_names "
+                              "USING fts5(name, tokenize='trigram case_sensitive 1')")
+            return True
+        except sqlite3.OperationalError:
+            logging.warning("FTS5 trigram tokenizer not available | Name search will scan the products table")
+            return False
+
+    def fetch_one(self, sql, params=()):
+        with self.db_lock:
+            return self.conn.execute(sql, params).fetchone()
+
+    def fetch_all(self, sql, params=()):
+        with self.db_lock:
+            return self.conn.execute(sql, params).fetchall()
+
+    def fetch_chunks(self, sql, params=(), chunk_size=1000):
+        with self.db_lock:
+            cursor = self.conn.execute(sql, params)
+        try:
+            while True:
+                with self.db_lock:
+                    rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    return
+                yield from rows
+        finally:
+            cursor.close()
 
+    def iter_rows(self, columns, chunk_size=1000):
+        last_rowid = 0
+        while True:
+            rows = self.fetch_all(f"SELECT rowid, {columns} FROM products WHERE rowid > ? ORDER BY rowid LIMIT ?",
+                                  (last_rowid, chunk_size))
+            if not rows:
+                return
+            last_rowid = rows[-1][0]
+            for row in rows:
+                yield row[1:]
+
+    def write_locked(self):
+        return self.db_lock
+
+    def mark_write(self, count=1):
+        self.pending_writes += count
+        if self.pending_writes >= self.batch_size:
+            self.commit()
+
+    def commit(self):
+        with self.db_lock:
+            self.conn.commit()
+            logging.debug("Committed batch of [%s] write(s)", self.pending_writes)
+            self.pending_writes = 0
+
+    def flush(self):
+        if self.pending_writes or self.conn.in_transaction:
+            self.commit()
+
+    def load_thresholds(self):
+        for scope, key, threshold in self.conn.execute("SELECT scope, key, threshold FROM reorder_points"):
+            if scope == "global":
+                self.low_stock_limit = threshold
+            else:
+                (self.sku_thresholds if scope == "sku" else self.category_thresholds)[key] = threshold
+
+    def low_stock_clause(self):
+        if not self.category_thresholds and not self.sku_thresholds:
+            return "stock < ?", [self.low_stock_limit]
+        return ("stock < COALESCE((SELECT threshold FROM reorder_points WHERE scope = 'sku' AND key = products.ID), "
+                "(SELECT threshold FROM reorder_points WHERE scope = 'category' AND key = products.category), ?)",
+                [self.low_stock_limit])
+
+    def set_reorder_threshold(self, threshold, category=None, i_d=None):
+        if i_d is not None:
+            scope, key, overrides, where, params = "sku", i_d, self.sku_thresholds, "ID = ?", [i_d]
+        elif category is not None:
+            scope, key, overrides, where, params = "category", category, self.category_thresholds, "category = ?", [category]
+        else:
+            scope, key, overrides, where, params = "global", "", None, "1", []
+        with self.db_lock:
+            affected = [self.Product(*row) for row in self.conn.execute(
+                f"SELECT {PRODUCT_COLUMNS} FROM products WHERE {where}", params)] if self.stock_listeners else []
+            before = {product.ID: self.threshold_of(product) for product in affected}
+            if overrides is None:
+                self.low_stock_limit = threshold
+            elif threshold is None:
+                overrides.pop(key, None)
+            else:
+                overrides[key] = threshold
+            if threshold is None:
+                self.conn.execute("DELETE FROM reorder_points WHERE scope = ? AND key = ?", (scope, key))
+            else:
+                self.conn.execute("INSERT INTO reorder_points (scope, key, threshold) VALUES (?, ?, ?) "
+                                  "ON CONFLICT(scope, key) DO UPDATE SET threshold = excluded.threshold",
+                                  (scope, key, threshold))
+            for product in affected:
+                old_threshold, new_threshold = before[product.ID], self.threshold_of(product)
+                if (product.stock < old_threshold) != (product.stock < new_threshold):
+                    self.pending_events.append(("low" if product.stock < new_threshold else "restocked",
+                                                product, new_threshold))
+            count = self.conn.execute(f"SELECT COUNT(*) FROM products WHERE {where}", params).fetchone()[0]
+            self.commit()
+            self.bump("stock")
+        self.fire_events()
+        logging.info("Reorder threshold set to [%s] | Category: %s | ID: %s | Products re-checked: %s",
+                     threshold, category, i_d, count)
+        return count
+
+    def low_stock_products(self):
+        where, params = self.low_stock_clause()
+        return [self.Product(*row) for row in self.fetch_all(
+            f"SELECT {PRODUCT_COLUMNS} FROM products WHERE {where} ORDER BY stock", params)]
 
     def add_product(self, product_data):
+        with self.db_lock:
+            new_product = self.insert_product(product_data)
+            self.commit()
+        self.fire_events()
+        if logging.root.isEnabledFor(logging.INFO):
+            logging.info("Product Added successfully [ID: %s | Name: %s]\n", new_product.ID, new_product.name)
+
+    def add_products(self, batch):
+        count = 0
+        with self.db_lock:
+            for product_data in batch:
+                self.insert_product(product_data)
+                count += 1
+            self.mark_write(count)
+        self.fire_events()
+        logging.info("Batch of [%s] product(s) added successfully\n", count)
+        return count
+
+    def insert_product(self, product_data):
         new_product = self.Product(product_data["ID"], product_data["name"],
                               product_data["company"], product_data["category"],
                               product_data["sub_category"], product_data["price"],
                               product_data["stock"])
-        self.products[new_product.ID] = new_product
-        self.products_names.add(new_product.name)
-        self.company[new_product.company].append(new_product.ID)
-        self.category[new_product.category].append(new_product.ID)
-        self.sub_category[new_product.sub_category].append(new_product.ID)
-        logging.info(f"Product Added successfully [ID: {new_product.ID} | Name: {new_product.name}]\n")
+        cursor = self.conn.execute(f"INSERT INTO products ({PRODUCT_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                                   new_product)
+        if self.name_search:
+            self.conn.execute("INSERT INTO product_names (rowid, name) VALUES (?, ?)",
+                              (cursor.lastrowid, new_product.name))
+        self.track_id(new_product.ID)
+        if self.fuzzy is not None:
+            self.fuzzy.add_terms(new_product.name, new_product.company, new_product.category, new_product.sub_category)
+        for field, prefix_index in self.facet_prefixes.items():
+            prefix_index.add(getattr(new_product, self.facet_attributes[field]))
+        self.note_crossing(None, new_product)
+        self.bump(*self.generations)
+        return new_product
 
+    def get_product(self):
+        logging.debug("Returning Product Mapping (SQLite)")
+        return self.products
+
+    def track_id(self, i_d):
+        counter, prefix = i_d[:-3], i_d[-3:]
+        if counter.isdigit():
+            self.conn.execute("INSERT INTO id_counters (prefix, next_counter) VALUES (?, ?) "
+                              "ON CONFLICT(prefix) DO UPDATE SET "
+                              "next_counter = MAX(next_counter, excluded.next_counter)",
+                              (prefix, int(counter) + 1))
+
+    def reserve_id_counter(self, prefix):
+        with self.db_lock:
+            row = self.conn.execute("SELECT next_counter FROM id_counters WHERE prefix = ?", (prefix,)).fetchone()
+            counter = row[0] if row else 1
+            self.conn.execute("INSERT INTO id_counters (prefix, next_counter) VALUES (?, ?) "
+                              "ON CONFLICT(prefix) DO UPDATE SET next_counter = excluded.next_counter",
+                              (prefix, counter + 1))
+            return counter
+
+    def update_stock(self, key, stock):
+        with self.db_lock:
+            old_stock = self.products[key].stock if self.stock_listeners else None
+            self.conn.execute("UPDATE products SET stock = ? WHERE ID = ?", (stock, key))
+            self.commit()
+            self.bump("stock")
+            logging.debug("Stock updated in SQLite [ID: %s | New stock: %s]", key, stock)
+            product = self.products[key]
+            self.note_crossing(old_stock, product)
+        self.fire_events()
+        return product
+
+    def adjust_stock(self, key, delta):
+        with self.db_lock:
+            cursor = self.conn.execute("UPDATE products SET stock = stock + ? WHERE ID = ? AND stock + ? >= 0",
+                                       (delta, key, delta))
+            if not cursor.rowcount:
+                logging.warning("Stock of [%s] not adjusted by [%+d] | Missing product or stock below zero",
+                                key, delta)
+                return None
+            self.commit()
+            self.bump("stock")
+            product = self.products[key]
+            self.note_crossing(product.stock - delta, product)
+        self.fire_events()
+        return product
+
+    def apply_stock_deltas(self, deltas):
+        with self.db_lock:
+            ids, current = list(deltas), {}
+            for start in range(0, len(ids), 500):
+                chunk = ids[start:start + 500]
+                current.update(self.conn.execute(
+                    f"SELECT ID, stock FROM products WHERE ID IN ({', '.join('?' * len(chunk))})", chunk))
+            new_stocks = {}
+            for key, delta in deltas.items():
+                if key not in current or current[key] + delta < 0:
+                    logging.warning("Stock movement on [%s] rejected | Missing product or stock below zero", key)
+                    return None
+                new_stocks[key] = current[key] + delta
+            self.conn.executemany("UPDATE products SET stock = ? WHERE ID = ?",
+                                  [(stock, key) for key, stock in new_stocks.items()])
+            self.pending_writes += len(new_stocks)
+            self.commit()
+            self.bump("stock")
+            if self.stock_listeners:
+                for product in self.fetch_products(new_stocks):
+                    self.note_crossing(current[product.ID], product)
+        self.fire_events()
+        return new_stocks
+
+    def analysis_snapshot(self):
+        logging.debug("Aggregating analysis in SQLite")
+        count_category, avg_stocks_per_category = Counter(), {}
+        with self.db_lock:
+            for category, count, total in self.conn.execute(
+                    "SELECT category, COUNT(*), SUM(stock) FROM products GROUP BY category"):
+                count_category[category] = count
+                avg_stocks_per_category[category] = total / count
+            count_sub_category = Counter(dict(self.conn.execute(
+                "SELECT sub_category, COUNT(*) FROM products GROUP BY sub_category")))
+            count_company = Counter(dict(self.conn.execute(
+                "SELECT company, COUNT(*) FROM products GROUP BY company")))
+            where, params = self.low_stock_clause()
+            low_stock_rows = self.conn.execute(f"SELECT name, stock FROM products WHERE {where}", params).fetchall()
+        return (count_category, count_sub_category, count_company, len(low_stock_rows), dict(low_stock_rows),
+                avg_stocks_per_category)
+
+    def range_clause(self, field, lo=None, hi=None):
+        column = self.sorted_fields[field]
+        conditions, params = [], []
+        if lo is not None:
+            conditions.append(f"{column} >= ?")
+            params.append(lo)
+        if hi is not None:
+            conditions.append(f"{column} <= ?")
+            params.append(hi)
+        return (" WHERE " + " AND ".join(conditions) if conditions else ""), params
+
+    def range_count(self, field, lo=None, hi=None):
+        where, params = self.range_clause(field, lo, hi)
+        return self.fetch_one(f"SELECT COUNT(*) FROM products{where}", params)[0]
+
+    def range_ids(self, field, lo=None, hi=None):
+        where, params = self.range_clause(field, lo, hi)
+        return [p_id for (p_id,) in self.fetch_all(
+            f"SELECT ID FROM products{where} ORDER BY {self.sorted_fields[field]}", params)]
+
+    def range_products(self, field, lo=None, hi=None):
+        where, params = self.range_clause(field, lo, hi)
+        return [self.Product(*row) for row in self.fetch_all(
+            f"SELECT {PRODUCT_COLUMNS} FROM products{where} ORDER BY {self.sorted_fields[field]}", params)]
+
+    def page_products(self, sort_by, descending=False, cursor=None, limit=50):
+        where, params, direction = "", [], " DESC" if descending else ""
+        if cursor is not None:
+            where, params = f" WHERE ({sort_by}, ID) {'<' if descending else '>'} (?, ?)", list(cursor)
+        return [self.Product(*row) for row in self.fetch_all(
+            f"SELECT {PRODUCT_COLUMNS} FROM products{where} ORDER BY {sort_by}{direction}, ID{direction} LIMIT ?",
+            params + [limit])]
+
+    def fetch_products(self, ids):
+        ids, selected_products = list(ids), []
+        for start in range(0, len(ids), 500):
+            chunk = ids[start:start + 500]
+            placeholders = ", ".join("?" * len(chunk))
+            selected_products.extend(self.Product(*row) for row in self.fetch_all(
+                f"SELECT {PRODUCT_COLUMNS} FROM products WHERE ID IN ({placeholders})", chunk))
+        return selected_products
+
+    def search_names(self, term):
+        if self.name_search and len(term) >= self.gram_size:
+            phrase = '"' + term.replace('"', '""') + '"'
+            rows = self.fetch_all("SELECT p.ID FROM product_names JOIN products p ON p.rowid = product_names.rowid "
+                                  "WHERE product_names MATCH ?", (phrase,))
+        else:
+            rows = self.fetch_all("SELECT ID FROM products WHERE instr(name, ?) > 0", (term,))
+        return {p_id for (p_id,) in rows}
+
+    def query_products(self, facets, name=None, ranges=None):
+        conditions, params = [], []
+        for field, value in facets.items():
+            conditions.append(f"{self.facet_attributes[field]} = ?")
+            params.append(value)
+        if name is not None:
+            if self.name_search and len(name) >= self.gram_size:
+                conditions.append("rowid IN (SELECT rowid FROM product_names WHERE product_names MATCH ?)")
+                params.append('"' + name.replace('"', '""') + '"')
+            else:
+                conditions.append("instr(name, ?) > 0")
+                params.append(name)
+        for field, (lo, hi) in (ranges or {}).items():
+            where, range_params = self.range_clause(field, lo, hi)
+            if range_params:
+                conditions.append(where[len(" WHERE "):])
+                params.extend(range_params)
+        where = " WHERE " + " AND ".join(conditions) if conditions else ""
+        for row in self.fetch_chunks(f"SELECT {PRODUCT_COLUMNS} FROM products{where}", params):
+            yield self.Product(*row)
+
+    def suggest_terms(self, term, limit=5):
+        with self.db_lock:
+            if self.fuzzy is None:
+                logging.info("Building the fuzzy term index from the products table")
+                self.fuzzy = FuzzyIndex()
+                for row in self.iter_rows("name, company, category, sub_category"):
+                    self.fuzzy.add_terms(*row)
+            return self.fuzzy.lookup(term, limit)
+
+    def prefix_index(self, field):
+        if field not in self.facet_prefixes:
+            attribute = self.facet_attributes[field]
+            prefix_index = PrefixIndex()
+            for value, count in self.fetch_all(f"SELECT {attribute}, COUNT(*) FROM products GROUP BY {attribute}"):
+                prefix_index.add(value, count)
+            self.facet_prefixes[field] = prefix_index
+        return self.facet_prefixes[field]
+
+    def facet_page(self, field, prefix="", offset=0, limit=10):
+        with self.db_lock:
+            return self.prefix_index(field).page(prefix, offset, limit)
+
+    def facet_matches(self, field, prefix=""):
+        with self.db_lock:
+            return self.prefix_index(field).matches(prefix)
+
+    def search_ids(self, term):
+        matching_ids = {p_id for (p_id,) in self.fetch_all(
+            "SELECT ID FROM products WHERE company = ? OR category = ? OR sub_category = ?", (term, term, term))}
+        matching_ids.update(self.search_names(term))
+        logging.debug("[%s] matched [%s] product(s) in SQLite", term, len(matching_ids))
+        return matching_ids
+
+    def close(self):
+        with self.db_lock:
+            self.flush()
+            self.conn.close()
+        logging.info("SQLite DataLayer closed")
+
+
+class DurableDataLayer(DataLayer):
+    def __init__(self, log_dir, id_width=4, sync_commit=True, commit_interval=0.005, snapshot_interval=300):
+        super().__init__(id_width)
+        self.log_dir = log_dir
+        self.sync_commit = sync_commit
+        self.commit_interval = commit_interval
+        self.snapshot_interval = snapshot_interval
+        self.state_lock = threading.RLock()
+        self.log_cond = threading.Condition()
+        self.pending_records = []
+        self.written_seq = 0
+        self.flushed_seq = 0
+        self.closing = threading.Event()
+        self.replaying = False
+        self.replay_batch = 10000
+
+        os.makedirs(log_dir, exist_ok=True)
+        self.segment = self.recover() + 1
+        self.log_file = open(self.segment_path(self.segment), "a", encoding="utf-8")
+        self.flusher = threading.Thread(target=self.flush_loop, name="wal-flusher", daemon=True)
+        self.flusher.start()
+        self.snapshotter = threading.Thread(target=self.snapshot_loop, name="wal-snapshotter", daemon=True)
+        self.snapshotter.start()
+
+    def segment_path(self, segment):
+        return os.path.join(self.log_dir, f"wal-{segment:08}.jsonl")
+
+    def snapshot_path(self, segment):
+        return os.path.join(self.log_dir, f"snapshot-{segment:08}.jsonl")
+
+    def list_files(self, prefix):
+        numbers = []
+        for file_name in os.listdir(self.log_dir):
+            if file_name.startswith(prefix) and file_name.endswith(".jsonl"):
+                number = file_name[len(prefix):-len(".jsonl")]
+                if number.isdigit():
+                    numbers.append(int(number))
+        return sorted(numbers)
+
+    def recover(self):
+        snapshots = self.list_files("snapshot-")
+        last_segment = 0
+        self.replaying = True
+        try:
+            if snapshots:
+                last_segment = snapshots[-1]
+                logging.info("Loading snapshot [%s]", self.snapshot_path(last_segment))
+                with open(self.snapshot_path(last_segment), encoding="utf-8") as snapshot:
+                    header = json.loads(next(snapshot))
+                    while True:
+                        batch = [dict(zip(self.Product._fields, json.loads(line)))
+                                 for line in islice(snapshot, self.replay_batch)]
+                        if not batch:
+                            break
+                        self.add_products(batch)
+                self.restore_thresholds(header.get("thresholds"))
+
+            for segment in self.list_files("wal-"):
+                if segment <= last_segment:
+                    continue
+                replayed = self.replay_segment(segment)
+                logging.info("Replayed [%s] record(s) from segment [%s]", replayed, segment)
+                last_segment = segment
+        finally:
+            self.replaying = False
+        return last_segment
+
+    def replay_segment(self, segment):
+        replayed, added = 0, []
+        with open(self.segment_path(segment), encoding="utf-8") as log_file:
+            for line in log_file:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    logging.warning("Torn record at the end of segment [%s] | Stopping replay", segment)
+                    break
+                replayed += 1
+                if record["op"] == "add":
+                    added.append(dict(zip(self.Product._fields, record["p"])))
+                    if len(added) >= self.replay_batch:
+                        self.add_products(added)
+                        added = []
+                    continue
+                if added:
+                    self.add_products(added)
+                    added = []
+                if record["op"] == "stocks":
+                    self.update_stocks(record["s"])
+                elif record["op"] == "threshold":
+                    self.set_reorder_threshold(record["t"], record["c"], record["i"])
+                else:
+                    self.update_stock(record["id"], record["stock"])
+        if added:
+            self.add_products(added)
+        return replayed
+
+    def restore_thresholds(self, thresholds):
+        if not thresholds:
+            return
+        self.set_reorder_threshold(thresholds["limit"])
+        for category, threshold in thresholds["categories"].items():
+            self.set_reorder_threshold(threshold, category=category)
+        for i_d, threshold in thresholds["skus"].items():
+            self.set_reorder_threshold(threshold, i_d=i_d)
+
+    def append_record(self, record):
+        with self.log_cond:
+            self.pending_records.append(json.dumps(record, separators=(",", ":")))
+            self.written_seq += 1
+            seq = self.written_seq
+            self.log_cond.notify_all()
+        return seq
+
+    def wait_durable(self, seq):
+        if not self.sync_commit:
+            return
+        with self.log_cond:
+            while self.flushed_seq < seq and not self.closing.is_set():
+                self.log_cond.wait()
+
+    def write_pending(self):
+        if not self.pending_records:
+            return
+        batch, self.pending_records = self.pending_records, []
+        self.log_file.write("\n".join(batch) + "\n")
+        self.log_file.flush()
+        os.fsync(self.log_file.fileno())
+        self.flushed_seq += len(batch)
+        self.log_cond.notify_all()
+
+    def flush_loop(self):
+        while True:
+            with self.log_cond:
+                while not self.pending_records and not self.closing.is_set():
+                    self.log_cond.wait()
+                if not self.pending_records and self.closing.is_set():
+                    return
+            time.sleep(self.commit_interval)
+            with self.log_cond:
+                self.write_pending()
+                logging.debug("Group commit | Durable up to record [%s]", self.flushed_seq)
+
+    def add_product(self, product_data):
+        with self.state_lock:
+            super().add_product(product_data)
+            if self.replaying:
+                return
+            product = self.products[product_data["ID"]]
+            seq = self.append_record({"op": "add", "p": list(product)})
+        self.wait_durable(seq)
+
+    def add_products(self, batch):
+        with self.state_lock:
+            count = super().add_products(batch)
+            if self.replaying:
+                return count
+            seq = self.flushed_seq
+            for product_data in batch:
+                seq = self.append_record({"op": "add", "p": list(self.products[product_data["ID"]])})
+        self.wait_durable(seq)
+        return count
+
+    def update_stock(self, key, stock):
+        with self.state_lock:
+            product = super().update_stock(key, stock)
+            if self.replaying:
+                return product
+            seq = self.append_record({"op": "stock", "id": key, "stock": stock})
+        self.wait_durable(seq)
+        return product
+
+    def adjust_stock(self, key, delta):
+        with self.state_lock:
+            product = super().adjust_stock(key, delta)
+            if product is None or self.replaying:
+                return product
+            seq = self.append_record({"op": "stock", "id": key, "stock": product.stock})
+        self.wait_durable(seq)
+        return product
+
+    def apply_stock_deltas(self, deltas):
+        with self.state_lock:
+            new_stocks = super().apply_stock_deltas(deltas)
+            if new_stocks is None or self.replaying:
+                return new_stocks
+            seq = self.append_record({"op": "stocks", "s": new_stocks})
+        self.wait_durable(seq)
+        return new_stocks
+
+    def set_reorder_threshold(self, threshold, category=None, i_d=None):
+        with self.state_lock:
+            count = super().set_reorder_threshold(threshold, category, i_d)
+            if self.replaying:
+                return count
+            seq = self.append_record({"op": "threshold", "t": threshold, "c": category, "i": i_d})
+        self.wait_durable(seq)
+        return count
+
+    def snapshot(self):
+        with self.state_lock:
+            rows = [list(product) for product in self.products.values()]
+            thresholds = {"limit": self.low_stock_limit,
+                          "categories": {self.decode(code): threshold
+                                         for code, threshold in self.category_thresholds.items()},
+                          "skus": dict(self.sku_thresholds)}
+            with self.log_cond:
+                self.write_pending()
+                self.log_file.close()
+                covered_segment = self.segment
+                self.segment += 1
+                self.log_file = open(self.segment_path(self.segment), "a", encoding="utf-8")
+
+        temp_path = self.snapshot_path(covered_segment) + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as snapshot:
+            snapshot.write(json.dumps({"version": 1, "segment": covered_segment, "products": len(rows),
+                                       "thresholds": thresholds}) + "\n")
+            for start in range(0, len(rows), 1000):
+                snapshot.write("".join(json.dumps(row, separators=(",", ":")) + "\n"
+                                       for row in rows[start:start + 1000]))
+            snapshot.flush()
+            os.fsync(snapshot.fileno())
+        os.replace(temp_path, self.snapshot_path(covered_segment))
+
+        for segment in self.list_files("wal-"):
+            if segment <= covered_segment:
+                os.remove(self.segment_path(segment))
+        for segment in self.list_files("snapshot-"):
+            if segment < covered_segment:
+                os.remove(self.snapshot_path(segment))
+        logging.info("Snapshot written [%s product(s)] | Log truncated up to segment [%s]", len(rows), covered_segment)
+        return covered_segment
+
+    def snapshot_loop(self):
+        while not self.closing.wait(self.snapshot_interval):
+            try:
+                self.snapshot()
+            except OSError as error:
+                logging.error("Snapshot failed: %s", error)
+
+    def flush(self):
+        with self.log_cond:
+            self.write_pending()
+
+    def close(self):
+        self.closing.set()
+        with self.log_cond:
+            self.log_cond.notify_all()
+        self.snapshotter.join()
+        self.flusher.join()
+        with self.log_cond:
+            self.write_pending()
+            self.log_file.close()
+        logging.info("Durable DataLayer closed")
+
+
+def write_binary_snapshot(data_layer, path):
+    products = sorted((tuple(product) for product in data_layer.products.values()), key=itemgetter(0))
+    count = len(products)
+    values = sorted({value for product in products for value in product[2:5]})
+    value_codes = {value: code for code, value in enumerate(values)}
+    columns = {attribute: array("I", [value_codes[product[index]] for product in products])
+               for index, attribute in ((2, "company"), (3, "category"), (4, "sub_category"))}
+    prices = array("d", [product[5] for product in products])
+    stocks = array("q", [product[6] for product in products])
+
+    sections = []
+    for label, strings in (("id", [p[0] for p in products]), ("name", [p[1] for p in products]), ("value", values)):
+        encoded = [text.encode("utf-8") for text in strings]
+        offsets = array("Q", [0])
+        for data in encoded:
+            offsets.append(offsets[-1] + len(data))
+        sections += [(f"{label}_offsets", offsets), (f"{label}_heap", b"".join(encoded))]
+    sections += [(attribute, column) for attribute, column in columns.items()]
+    sections += [("price", prices), ("stock", stocks)]
+
+    for attribute, column in columns.items():
+        postings = defaultdict(list)
+        for row, code in enumerate(column):
+            postings[code].append(row)
+        keys = sorted(postings)
+        starts, rows = array("Q", [0]), array("I")
+        for code in keys:
+            rows.extend(postings[code])
+            starts.append(len(rows))
+        sections += [(f"fk:{attribute}", array("I", keys)), (f"fs:{attribute}", starts), (f"fr:{attribute}", rows)]
+        if attribute == "category":
+            sections.append(("category_stock", array("q", [sum(stocks[row] for row in postings[code])
+                                                            for code in keys])))
+
+    names = [product[1] for product in products]
+    sections += [("name_order", array("I", sorted(range(count), key=names.__getitem__))),
+                 ("price_order", array("I", sorted(range(count), key=prices.__getitem__))),
+                 ("stock_order", array("I", sorted(range(count), key=stocks.__getitem__)))]
+
+    id_counters = {}
+    for product in products:
+        counter, prefix = product[0][:-3], product[0][-3:]
+        if counter.isdigit():
+            id_counters[prefix] = max(id_counters.get(prefix, 1), int(counter) + 1)
+    category_thresholds = getattr(data_layer, "category_thresholds", {})
+    meta = {
+        "byteorder": sys.byteorder,
+        "id_counters": id_counters,
+        "low_stock_limit": getattr(data_layer, "low_stock_limit", 10),
+        "category_thresholds": {data_layer.decode(code): threshold for code, threshold in category_thresholds.items()},
+        "sku_thresholds": dict(getattr(data_layer, "sku_thresholds", {})),
+    }
+    sections.insert(0, ("meta", json.dumps(meta).encode("utf-8")))
+
+    blobs = [(name, data.tobytes() if isinstance(data, array) else data) for name, data in sections]
+    offset = SNAPSHOT_HEADER.size + SNAPSHOT_SECTION.size * len(blobs)
+    table = []
+    for name, data in blobs:
+        offset += -offset % 8
+        table.append(SNAPSHOT_SECTION.pack(name.encode("ascii"), offset, len(data)))
+        offset += len(data)
+
+    temp_path = path + ".tmp"
+    with open(temp_path, "wb") as snapshot:
+        snapshot.write(SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, 0, count, len(blobs)))
+        snapshot.write(b"".join(table))
+        for name, data in blobs:
+            snapshot.write(b"\0" * (-snapshot.tell() % 8))
+            snapshot.write(data)
+        snapshot.flush()
+        os.fsync(snapshot.fileno())
+    os.replace(temp_path, path)
+    logging.info("Binary snapshot written [%s product(s) | %s]", count, path)
+    return count
+
+
+class MappedProducts(Mapping):
+    def __init__(self, data_layer):
+        self.dl = data_layer
+
+    def __getitem__(self, key):
+        row = self.dl.row_of(key)
+        if row is not None:
+            return self.dl.product_at(row)
+        return self.dl.delta.products[key]
+
+    def __contains__(self, key):
+        return self.dl.row_of(key) is not None or key in self.dl.delta.products
+
+    def __iter__(self):
+        for row in range(self.dl.count):
+            yield self.dl.text_at("id", row)
+        yield from list(self.dl.delta.products)
+
+    def __len__(self):
+        return self.dl.count + len(self.dl.delta.products)
+
+    def values(self):
+        return StreamingValuesView(self)
+
+    def items(self):
+        return StreamingItemsView(self)
+
+    def iter_values(self):
+        for row in range(self.dl.count):
+            yield self.dl.product_at(row)
+        yield from list(self.dl.delta.products.values())
+
+    def iter_items(self):
+        for product in self.iter_values():
+            yield product.ID, product
+
+
+class MappedFacet(Mapping):
+    def __init__(self, data_layer, attribute):
+        self.dl = data_layer
+        self.attribute = attribute
+
+    def delta_index(self):
+        if self.attribute == "name":
+            return self.dl.delta.name_index, None
+        field = {v: k for k, v in self.dl.facet_attributes.items()}[self.attribute]
+        return self.dl.delta.all_search_fields[field], self.dl.delta.code_of
+
+    def __getitem__(self, value):
+        ids = [self.dl.text_at("id", row) for row in self.dl.base_rows(self.attribute, value)]
+        index, code_of = self.delta_index()
+        code = code_of(value) if code_of else value
+        if code is not None:
+            ids.extend(index.get(code, ()))
+        if not ids:
+            raise KeyError(value)
+        return ids
+
+    def __iter__(self):
+        index, code_of = self.delta_index()
+        delta_values = {self.dl.delta.decode(code) if code_of else code for code in list(index)}
+        return iter(sorted(set(self.dl.base_values(self.attribute)) | delta_values))
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+
+class MappedDataLayer(BaseDataLayer):
+    def __init__(self, path, id_width=4):
+        self.path = path
+        self.file = open(path, "rb")
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, _, self.count, section_count = SNAPSHOT_HEADER.unpack_from(self.map, 0)
+        if magic != SNAPSHOT_MAGIC:
+            raise ValueError(f"{path} is not an inventory snapshot")
+        if version != SNAPSHOT_VERSION:
+            raise ValueError(f"Unsupported snapshot version [{version}] in {path}")
+
+        self.views = [memoryview(self.map)]
+        self.sections = {}
+        for index in range(section_count):
+            entry = SNAPSHOT_HEADER.size + index * SNAPSHOT_SECTION.size
+            name, offset, length = SNAPSHOT_SECTION.unpack_from(self.map, entry)
+            self.sections[name.rstrip(b"\0").decode("ascii")] = (offset, length)
+        meta = json.loads(self.map[slice(*self.bounds("meta"))])
+        if meta["byteorder"] != sys.byteorder:
+            raise ValueError(f"Snapshot {path} was written on a {meta['byteorder']}-endian machine")
+
+        self.offsets = {label: self.column(f"{label}_offsets", "Q") for label in ("id", "name", "value")}
+        self.heaps = {label: self.bounds(f"{label}_heap")[0] for label in ("id", "name", "value")}
+        self.codes = {attribute: self.column(attribute, "I") for attribute in ("company", "category", "sub_category")}
+        self.prices = self.column("price", "d")
+        self.stocks = self.column("stock", "q")
+        self.postings = {attribute: (self.column(f"fk:{attribute}", "I"), self.column(f"fs:{attribute}", "Q"),
+                                     self.column(f"fr:{attribute}", "I"))
+                         for attribute in ("company", "category", "sub_category")}
+        self.base_category_stock = self.column("category_stock", "q")
+        self.orders = {field: self.column(f"{field}_order", "I") for field in ("name", "price", "stock")}
+
+        self.delta = DataLayer(id_width)
+        self.stock_overrides = {}
+        self.products = MappedProducts(self)
+        self.category = MappedFacet(self, "category")
+        self.sub_category = MappedFacet(self, "sub_category")
+        self.company = MappedFacet(self, "company")
+        self.all_search_fields = {
+            "Company": self.company,
+            "Category": self.category,
+            "Sub-Category": self.sub_category
+        }
+        self.facet_attributes = {
+            "Company": "company",
+            "Category": "category",
+            "Sub-Category": "sub_category"
+        }
+        self.name_index = MappedFacet(self, "name")
+        self.sorted_fields = {
+            "price": "price",
+            "stock": "stock"
+        }
+        self.generations = dict.fromkeys(("Company", "Category", "Sub-Category", "name", "price", "stock"), 0)
+        self.gram_size = 3
+        self.low_stock_limit = meta["low_stock_limit"]
+        self.category_thresholds = meta["category_thresholds"]
+        self.sku_thresholds = meta["sku_thresholds"]
+        self.delta.low_stock_limit = self.low_stock_limit
+        for category, threshold in self.category_thresholds.items():
+            self.delta.category_thresholds[self.delta.encode(category)] = threshold
+        self.stock_listeners = []
+        self.pending_events = []
+        self.id_width = id_width
+        self.id_counters = meta["id_counters"]
+        self.lock = ReadWriteLock()
+        self.fuzzy = None
+        self.facet_prefixes = {}
+        self.dirty = False
+        logging.info("Mapped snapshot opened [%s product(s) | %s]", self.count, path)
+
+    def bounds(self, name):
+        offset, length = self.sections[name]
+        return offset, offset + length
+
+    def column(self, name, typecode):
+        start, end = self.bounds(name)
+        view = self.views[0][start:end].cast(typecode)
+        self.views.append(view)
+        return view
+
+    def text_at(self, label, index):
+        offsets, start = self.offsets[label], self.heaps[label]
+        return self.map[start + offsets[index]:start + offsets[index + 1]].decode("utf-8")
+
+    def search_heap(self, label, text, count):
+        key, offsets, start = text.encode("utf-8"), self.offsets[label], self.heaps[label]
+        lo, hi = 0, count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.map[start + offsets[mid]:start + offsets[mid + 1]] < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < count and self.map[start + offsets[lo]:start + offsets[lo + 1]] == key:
+            return lo
+        return None
+
+    def row_of(self, i_d):
+        return self.search_heap("id", i_d, self.count)
+
+    def value_code(self, value):
+        return self.search_heap("value", value, len(self.offsets["value"]) - 1)
+
+    def stock_at(self, row):
+        return self.stock_overrides.get(row, self.stocks[row])
+
+    def value_at(self, field, row):
+        return self.prices[row] if field == "price" else self.stock_at(row)
+
+    def product_at(self, row):
+        return self.Product(self.text_at("id", row), self.text_at("name", row),
+                            self.text_at("value", self.codes["company"][row]),
+                            self.text_at("value", self.codes["category"][row]),
+                            self.text_at("value", self.codes["sub_category"][row]),
+                            self.prices[row], self.stock_at(row))
+
+    def posting(self, attribute, code):
+        keys, starts, rows = self.postings[attribute]
+        index = bisect_left(keys, code)
+        if index == len(keys) or keys[index] != code:
+            return rows[0:0]
+        return rows[starts[index]:starts[index + 1]]
+
+    def base_rows(self, attribute, value):
+        if attribute == "name":
+            order = self.orders["name"]
+            start = bisect_left(order, value, key=lambda row: self.text_at("name", row))
+            end = bisect_right(order, value, lo=start, key=lambda row: self.text_at("name", row))
+            return order[start:end]
+        code = self.value_code(value)
+        return self.posting(attribute, code) if code is not None else []
+
+    def base_values(self, attribute):
+        if attribute == "name":
+            return {self.text_at("name", row) for row in range(self.count)}
+        return [self.text_at("value", code) for code in self.postings[attribute][0]]
+
+    def read_locked(self):
+        return self.lock.read_locked()
+
+    def write_locked(self):
+        return self.lock.write_locked()
+
+    def bump(self, *index_names):
+        super().bump(*index_names)
+        self.dirty = True
 
     def get_product(self):
-        logging.debug("Returning Product Dictionary (self.products)")
+        logging.debug("Returning Product Mapping (mapped snapshot)")
+        return self.products
+
+    def reserve_id_counter(self, prefix):
+        with self.write_locked():
+            counter = self.id_counters.get(prefix, 1)
+            self.id_counters[prefix] = counter + 1
+            return counter
+
+    def add_product(self, product_data):
+        self.add_products([product_data])
+
+    def add_products(self, batch):
+        batch = list(batch)
+        if not batch:
+            return 0
+        with self.write_locked():
+            taken = [product_data["ID"] for product_data in batch if self.row_of(product_data["ID"]) is not None]
+            if taken:
+                logging.error("ID(s) %s already in the snapshot | Batch not added", taken)
+                return 0
+            for product_data in batch:
+                self.track_id(product_data["ID"])
+                if self.fuzzy is not None:
+                    self.fuzzy.add_terms(product_data["name"], product_data["company"], product_data["category"],
+                                         product_data["sub_category"])
+                for field, prefix_index in self.facet_prefixes.items():
+                    prefix_index.add(product_data[self.facet_attributes[field]])
+            count = self.delta.add_products(batch) if len(batch) > 1 else (self.delta.add_product(batch[0]) or 1)
+            self.bump(*self.generations)
+        self.fire_events()
+        return count
+
+    def add_stock_listener(self, callback):
+        if not self.stock_listeners:
+            self.delta.add_stock_listener(self.queue_event)
+        super().add_stock_listener(callback)
+
+    def queue_event(self, event, product, threshold):
+        self.pending_events.append((event, product, threshold))
+
+    def set_base_stocks(self, new_stocks):
+        for row, stock in new_stocks.items():
+            old_stock = self.stock_at(row)
+            self.stock_overrides[row] = stock
+            self.note_crossing(old_stock, self.product_at(row))
+
+    def update_stock(self, key, stock):
+        return self.update_stocks({key: stock})[key]
+
+    def update_stocks(self, new_stocks):
+        with self.write_locked():
+            updated = self.store_stocks(new_stocks)
+        self.fire_events()
+        return updated
+
+    def store_stocks(self, new_stocks):
+        base, delta = {}, {}
+        for key, stock in new_stocks.items():
+            row = self.row_of(key)
+            if row is None:
+                delta[key] = stock
+            else:
+                base[row] = stock
+        self.set_base_stocks(base)
+        updated = self.delta.update_stocks(delta) if delta else {}
+        updated.update((self.text_at("id", row), self.product_at(row)) for row in base)
+        self.bump("stock")
+        return updated
+
+    def adjust_stock(self, key, delta):
+        new_stocks = self.apply_stock_deltas({key: delta})
+        return self.products[key] if new_stocks else None
+
+    def apply_stock_deltas(self, deltas):
+        with self.write_locked():
+            new_stocks = {}
+            for key, delta in deltas.items():
+                product = self.products.get(key)
+                if product is None or product.stock + delta < 0:
+                    logging.warning("Stock movement on [%s] rejected | Missing product or stock below zero", key)
+                    return None
+                new_stocks[key] = product.stock + delta
+            self.store_stocks(new_stocks)
+        self.fire_events()
+        return new_stocks
+
+    def set_reorder_threshold(self, threshold, category=None, i_d=None):
+        with self.write_locked():
+            if i_d is not None:
+                overrides, key = self.sku_thresholds, i_d
+                rows = [self.row_of(i_d)] if self.row_of(i_d) is not None else []
+            elif category is not None:
+                overrides, key = self.category_thresholds, category
+                rows = self.base_rows("category", category)
+            else:
+                overrides, key = None, None
+                rows = range(self.count)
+            before = {row: self.threshold_of(self.product_at(row)) for row in rows} if self.stock_listeners else {}
+            if overrides is None:
+                self.low_stock_limit = threshold
+            elif threshold is None:
+                overrides.pop(key, None)
+            else:
+                overrides[key] = threshold
+            count = len(rows) + self.delta.set_reorder_threshold(threshold, category, i_d)
+
+            for row, old_threshold in before.items():
+                product = self.product_at(row)
+                new_threshold = self.threshold_of(product)
+                if (product.stock < old_threshold) != (product.stock < new_threshold):
+                    self.pending_events.append(("low" if product.stock < new_threshold else "restocked",
+                                                product, new_threshold))
+            self.bump("stock")
+        self.fire_events()
+        logging.info("Reorder threshold set to [%s] on the snapshot | Category: %s | ID: %s | Products re-checked: %s",
+                     threshold, category, i_d, count)
+        return count
+
+    def row_threshold(self, row):
+        threshold = self.sku_thresholds.get(self.text_at("id", row)) if self.sku_thresholds else None
+        if threshold is None and self.category_thresholds:
+            threshold = self.category_thresholds.get(self.text_at("value", self.codes["category"][row]))
+        return self.low_stock_limit if threshold is None else threshold
+
+    def base_low_rows(self):
+        limit = max([self.low_stock_limit, *self.category_thresholds.values(), *self.sku_thresholds.values()])
+        order = self.orders["stock"]
+        end = bisect_left(order, limit, key=self.stocks.__getitem__)
+        rows = [row for row in order[:end] if row not in self.stock_overrides]
+        rows.extend(self.stock_overrides)
+        return [row for row in rows if self.stock_at(row) < self.row_threshold(row)]
+
+    def low_stock_products(self):
+        with self.read_locked():
+            products = [self.product_at(row) for row in self.base_low_rows()]
+            products.extend(self.delta.low_stock_products())
+            return sorted(products, key=attrgetter("stock"))
+
+    def analysis_snapshot(self):
+        logging.debug("Reading analysis from the mapped snapshot")
+        with self.read_locked():
+            counts = {}
+            for attribute in ("category", "sub_category", "company"):
+                keys, starts, _ = self.postings[attribute]
+                counts[attribute] = Counter({self.text_at("value", code): starts[index + 1] - starts[index]
+                                             for index, code in enumerate(keys)})
+            category_stock = Counter({self.text_at("value", code): self.base_category_stock[index]
+                                      for index, code in enumerate(self.postings["category"][0])})
+            for row, stock in self.stock_overrides.items():
+                category_stock[self.text_at("value", self.codes["category"][row])] += stock - self.stocks[row]
+
+            (delta_category, delta_sub_category, delta_company, _, _, _) = self.delta.analysis_snapshot()
+            counts["category"].update(delta_category)
+            counts["sub_category"].update(delta_sub_category)
+            counts["company"].update(delta_company)
+            category_stock.update(self.delta.decode_counts(self.delta.category_stock))
+
+            low_rows = self.base_low_rows()
+            low_stocks_full = {self.text_at("name", row): self.stock_at(row) for row in low_rows}
+            delta_low = self.delta.low_stock_products()
+            low_stocks_full.update((product.name, product.stock) for product in delta_low)
+            avg_stocks_per_category = {k: category_stock[k] / v for k, v in counts["category"].items()}
+            return (counts["category"], counts["sub_category"], counts["company"], len(low_rows) + len(delta_low),
+                    low_stocks_full, avg_stocks_per_category)
+
+    def base_range_rows(self, field, lo=None, hi=None):
+        values = self.prices if field == "price" else self.stocks
+        order = self.orders[field]
+        start = 0 if lo is None else bisect_left(order, lo, key=values.__getitem__)
+        end = len(order) if hi is None else bisect_right(order, hi, key=values.__getitem__)
+        rows = order[start:max(start, end)]
+        if field == "price" or not self.stock_overrides:
+            return rows
+        moved = sorted((stock, row) for row, stock in self.stock_overrides.items()
+                       if (lo is None or stock >= lo) and (hi is None or stock <= hi))
+        return list(heapq.merge([row for row in rows if row not in self.stock_overrides],
+                                [row for _, row in moved], key=self.stock_at))
+
+    def range_count(self, field, lo=None, hi=None):
+        with self.read_locked():
+            return len(self.base_range_rows(field, lo, hi)) + self.delta.range_count(field, lo, hi)
+
+    def range_products(self, field, lo=None, hi=None):
+        with self.read_locked():
+            base = [self.product_at(row) for row in self.base_range_rows(field, lo, hi)]
+            return list(heapq.merge(base, self.delta.range_products(field, lo, hi), key=attrgetter(field)))
+
+    def range_ids(self, field, lo=None, hi=None):
+        return [product.ID for product in self.range_products(field, lo, hi)]
+
+    def sort_key_at(self, sort_by):
+        if sort_by in ("ID", "name"):
+            label = "id" if sort_by == "ID" else "name"
+            return lambda row: (self.text_at(label, row), self.text_at("id", row))
+        values = self.prices if sort_by == "price" else self.stocks
+        return lambda row: (values[row], self.text_at("id", row))
+
+    def base_page_rows(self, sort_by, descending, cursor, limit):
+        order = range(self.count) if sort_by == "ID" else self.orders[sort_by]
+        moved = self.stock_overrides if sort_by == "stock" else {}
+        key = self.sort_key_at(sort_by)
+        if descending:
+            end = len(order) if cursor is None else bisect_left(order, cursor, key=key)
+            rows = (order[index] for index in range(end - 1, -1, -1))
+        else:
+            start = 0 if cursor is None else bisect_right(order, cursor, key=key)
+            rows = (order[index] for index in range(start, len(order)))
+        rows = list(islice((row for row in rows if row not in moved), limit))
+        if moved:
+            moved_keys = sorted((stock, self.text_at("id", row)) for row, stock in moved.items())
+            moved_rows = [self.row_of(i_d) for _, i_d in page_of_keys(moved_keys, cursor, descending, limit)]
+            rows = list(islice(heapq.merge(rows, moved_rows, reverse=descending,
+                                           key=lambda row: (self.stock_at(row), self.text_at("id", row))), limit))
+        return rows
+
+    def page_products(self, sort_by, descending=False, cursor=None, limit=50):
+        with self.read_locked():
+            base = [self.product_at(row) for row in self.base_page_rows(sort_by, descending, cursor, limit)]
+            delta = self.delta.page_products(sort_by, descending, cursor, limit)
+            return list(islice(heapq.merge(base, delta, key=attrgetter(sort_by, "ID"), reverse=descending), limit))
+
+    def fetch_products(self, ids):
+        with self.read_locked():
+            return [self.products[p_id] for p_id in ids]
+
+    def base_name_rows(self, term):
+        needle, offsets, start = term.encode("utf-8"), self.offsets["name"], self.heaps["name"]
+        end = start + offsets[self.count] if self.count else start
+        rows, position = [], start
+        while True:
+            found = self.map.find(needle, position, end)
+            if found < 0:
+                return rows
+            row = bisect_right(offsets, found - start) - 1
+            if found - start + len(needle) <= offsets[row + 1]:
+                rows.append(row)
+                position = start + offsets[row + 1]
+            else:
+                position = found + 1
+
+    def search_names(self, term):
+        with self.read_locked():
+            matching_ids = {self.text_at("id", row) for row in self.base_name_rows(term)}
+            matching_ids.update(self.delta.search_names(term))
+            return matching_ids
+
+    def search_ids(self, term):
+        with self.read_locked():
+            matching_ids = set(self.search_names(term))
+            code = self.value_code(term)
+            if code is not None:
+                for attribute in ("company", "category", "sub_category"):
+                    matching_ids.update(self.text_at("id", row) for row in self.posting(attribute, code))
+            matching_ids.update(self.delta.search_ids(term))
+        logging.debug("[%s] matched [%s] product(s) in the mapped snapshot", term, len(matching_ids))
+        return matching_ids
+
+    def suggest_terms(self, term, limit=5):
+        with self.write_locked():
+            if self.fuzzy is None:
+                logging.info("Building the fuzzy term index from the mapped snapshot")
+                self.fuzzy = FuzzyIndex()
+                values = [self.text_at("value", code) for code in range(len(self.offsets["value"]) - 1)]
+                company, category, sub_category = (self.codes[a] for a in ("company", "category", "sub_category"))
+                for row in range(self.count):
+                    self.fuzzy.add_terms(self.text_at("name", row), values[company[row]], values[category[row]],
+                                         values[sub_category[row]])
+                for product in self.delta.products.values():
+                    self.fuzzy.add_terms(product.name, product.company, product.category, product.sub_category)
+            return self.fuzzy.lookup(term, limit)
+
+    def prefix_index(self, field):
+        if field in self.facet_prefixes:
+            return self.facet_prefixes[field]
+        with self.write_locked():
+            if field not in self.facet_prefixes:
+                keys, starts, _ = self.postings[self.facet_attributes[field]]
+                prefix_index = PrefixIndex()
+                for index, code in enumerate(keys):
+                    prefix_index.add(self.text_at("value", code), starts[index + 1] - starts[index])
+                for value, count in self.delta.facet_matches(field):
+                    prefix_index.add(value, count)
+                self.facet_prefixes[field] = prefix_index
+            return self.facet_prefixes[field]
+
+    def facet_page(self, field, prefix="", offset=0, limit=10):
+        prefix_index = self.prefix_index(field)
+        with self.read_locked():
+            return prefix_index.page(prefix, offset, limit)
+
+    def facet_matches(self, field, prefix=""):
+        prefix_index = self.prefix_index(field)
+        with self.read_locked():
+            return prefix_index.matches(prefix)
+
+    def query_products(self, facets, name=None, ranges=None):
+        ranges = ranges or {}
+        with self.read_locked():
+            codes, candidates = {}, None
+            for field, value in facets.items():
+                attribute = self.facet_attributes[field]
+                codes[attribute] = self.value_code(value)
+                if codes[attribute] is None:
+                    candidates = []
+                    break
+                posting = self.posting(attribute, codes[attribute])
+                if candidates is None or len(posting) < len(candidates):
+                    candidates = posting
+            if candidates != [] and ranges:
+                candidates = min([self.base_range_rows(field, lo, hi) for field, (lo, hi) in ranges.items()]
+                                 + ([candidates] if candidates is not None else []), key=len)
+            if candidates is None and name is not None:
+                candidates = self.base_name_rows(name)
+            if candidates is None:
+                candidates = range(self.count)
+            candidates = list(candidates)
+            delta_products = list(self.delta.query_products(facets, name, ranges))
+
+        for row in candidates:
+            if any(self.codes[attribute][row] != code for attribute, code in codes.items()):
+                continue
+            if not all((lo is None or self.value_at(field, row) >= lo)
+                       and (hi is None or self.value_at(field, row) <= hi) for field, (lo, hi) in ranges.items()):
+                continue
+            if name is None or name in self.text_at("name", row):
+                yield self.product_at(row)
+        yield from delta_products
+
+    def save(self, path=None):
+        with self.read_locked():
+            return write_binary_snapshot(self, path or self.path)
+
+    def flush(self):
+        self.delta.flush()
+
+    def close(self):
+        if self.dirty:
+            self.save()
+        self.delta.close()
+        for view in reversed(self.views):
+            view.release()
+        self.map.close()
+        self.file.close()
+        logging.info("Mapped snapshot closed [%s]", self.path)
+
+
+class ShardWorker:
+    def __init__(self, data_layer):
+        self.dl = data_layer
+        self.events = []
+        self.dl.add_stock_listener(lambda event, product, threshold:
+                                   self.events.append((event, tuple(product), threshold)))
+
+    def serve(self, connection):
+        while True:
+            try:
+                command, args = connection.recv()
+            except EOFError:
+                break
+            if command == "close":
+                connection.send((True, None, []))
+                break
+            try:
+                result = getattr(self, "do_" + command)(*args)
+            except Exception as error:
+                logging.exception("Shard command [%s] failed", command)
+                connection.send((False, f"{type(error).__name__}: {error}", self.events))
+            else:
+                connection.send((True, result, self.events))
+            self.events = []
+        self.dl.close()
+        connection.close()
+
+    def facet_index(self, field):
+        return self.dl.name_index if field == "name" else self.dl.all_search_fields[field]
+
+    def do_add_products(self, batch):
+        return self.dl.add_products(batch)
+
+    def do_adjust_stock(self, key, delta):
+        product = self.dl.adjust_stock(key, delta)
+        return tuple(product) if product is not None else None
+
+    def do_update_stock(self, key, stock):
+        return tuple(self.dl.update_stock(key, stock))
+
+    def do_apply_stock_deltas(self, deltas):
+        return self.dl.apply_stock_deltas(deltas)
+
+    def do_stock_levels(self, ids):
+        return {p_id: self.dl.products[p_id].stock for p_id in ids if p_id in self.dl.products}
+
+    def do_set_reorder_threshold(self, threshold, category, i_d):
+        return self.dl.set_reorder_threshold(threshold, category, i_d)
+
+    def do_low_stock(self):
+        return [tuple(product) for product in self.dl.low_stock_products()]
+
+    def do_suggest_terms(self, term, limit):
+        return self.dl.suggest_terms(term, limit)
+
+    def do_facet_matches(self, field, prefix):
+        return self.dl.facet_matches(field, prefix)
+
+    def do_facet_page(self, field, prefix, limit):
+        return self.dl.facet_page(field, prefix, 0, limit)[1]
+
+    def do_get(self, key):
+        product = self.dl.products.get(key)
+        return tuple(product) if product is not None else None
+
+    def do_ids(self):
+        return list(self.dl.products)
+
+    def do_rows(self):
+        return [tuple(product) for product in self.dl.products.values()]
+
+    def do_count(self):
+        return len(self.dl.products)
+
+    def do_facet_values(self, field):
+        if field == "name":
+            return list(self.dl.name_index)
+        return [self.dl.decode(code) for code in list(self.dl.all_search_fields[field])]
+
+    def do_facet_ids(self, field, value):
+        code = value if field == "name" else self.dl.code_of(value)
+        return list(self.facet_index(field).get(code, [])) if code is not None else []
+
+    def do_search_ids(self, term):
+        return self.dl.search_ids(term)
+
+    def do_search_names(self, term):
+        return self.dl.search_names(term)
+
+    def do_fetch(self, ids):
+        return [tuple(product) for product in self.dl.fetch_products(ids)]
+
+    def do_range_count(self, field, lo, hi):
+        return self.dl.range_count(field, lo, hi)
+
+    def do_range_rows(self, field, lo, hi):
+        return [tuple(product) for product in self.dl.range_products(field, lo, hi)]
+
+    def do_page_products(self, sort_by, descending, cursor, limit):
+        return [tuple(product) for product in self.dl.page_products(sort_by, descending, cursor, limit)]
+
+    def do_query(self, facets, name, ranges):
+        return [tuple(product) for product in self.dl.query_products(facets, name, ranges)]
+
+    def do_analysis(self):
+        with self.dl.read_locked():
+            snapshot = self.dl.analysis_snapshot()
+            return snapshot[:5] + (self.dl.decode_counts(self.dl.category_stock),)
+
+
+def run_shard(connection, columnar=False, log_records=None):
+    if log_records is not None:
+        atexit.unregister(log_listener.stop)
+        log_listener.stop()
+        log_handler.close()
+        logging.root.handlers = [QueueHandler(log_records)]
+    ShardWorker(ColumnarDataLayer() if columnar else DataLayer()).serve(connection)
+
+
+class ShardedProducts(Mapping):
+    def __init__(self, data_layer):
+        self.dl = data_layer
+
+    def __getitem__(self, key):
+        shard = self.dl.shard_of_id(key)
+        row = self.dl.call(shard, "get", key) if shard is not None else None
+        if row is None:
+            raise KeyError(key)
+        return self.dl.Product(*row)
+
+    def __contains__(self, key):
+        shard = self.dl.shard_of_id(key)
+        return shard is not None and self.dl.call(shard, "get", key) is not None
+
+    def __iter__(self):
+        for ids in self.dl.broadcast("ids"):
+            yield from ids
+
+    def __len__(self):
+        return sum(self.dl.broadcast("count"))
+
+    def __bool__(self):
+        return len(self) > 0
+
+    def values(self):
+        return StreamingValuesView(self)
+
+    def items(self):
+        return StreamingItemsView(self)
+
+    def iter_values(self):
+        for rows in self.dl.broadcast("rows"):
+            for row in rows:
+                yield self.dl.Product(*row)
+
+    def iter_items(self):
+        for product in self.iter_values():
+            yield product.ID, product
+
+
+class ShardedFacet(Mapping):
+    def __init__(self, data_layer, field):
+        self.dl = data_layer
+        self.field = field
+
+    def __getitem__(self, value):
+        ids = []
+        for shard_ids in self.dl.broadcast("facet_ids", self.field, value, shards=self.dl.shards_for(self.field, value)):
+            ids.extend(shard_ids)
+        if not ids:
+            raise KeyError(value)
+        return ids
+
+    def __iter__(self):
+        values = set()
+        for shard_values in self.dl.broadcast("facet_values", self.field):
+            values.update(shard_values)
+        return iter(sorted(values))
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+
+class ShardedDataLayer(BaseDataLayer):
+    def __init__(self, shards=None, partition="id", columnar=False, id_width=4):
+        if partition not in ("id", "category"):
+            raise ValueError(f"Unknown partition [{partition}] | Use 'id' or 'category'")
+
+        context = multiprocessing.get_context("spawn")
+        self.log_records = context.Queue()
+        self.log_listener = QueueListener(self.log_records, log_handler, respect_handler_level=True)
+        self.log_listener.start()
+        self.connections, self.processes, self.shard_locks = [], [], []
+        for index in range(shards or os.cpu_count() or 1):
+            connection, child_connection = context.Pipe()
+            process = context.Process(target=run_shard, args=(child_connection, columnar, self.log_records),
+                                      name=f"inventory-shard-{index}", daemon=True)
+            process.start()
+            child_connection.close()
+            self.connections.append(connection)
+            self.processes.append(process)
+            self.shard_locks.append(threading.Lock())
+
+        self.partition = partition
+        self.locations = {}
+        self.products = ShardedProducts(self)
+        self.category = ShardedFacet(self, "Category")
+        self.sub_category = ShardedFacet(self, "Sub-Category")
+        self.company = ShardedFacet(self, "Company")
+        self.all_search_fields = {
+            "Company": self.company,
+            "Category": self.category,
+            "Sub-Category": self.sub_category
+        }
+        self.facet_attributes = {
+            "Company": "company",
+            "Category": "category",
+            "Sub-Category": "sub_category"
+        }
+        self.name_index = ShardedFacet(self, "name")
+        self.facet_keys = {field: PrefixIndex() for field in self.all_search_fields}
+        self.sorted_fields = {
+            "price": "price",
+            "stock": "stock"
+        }
+        self.generations = dict.fromkeys(("Company", "Category", "Sub-Category", "name", "price", "stock"), 0)
+        self.low_stock_limit = 10
+        self.stock_listeners = []
+        self.pending_events = []
+        self.id_width = id_width
+        self.id_counters = {}
+        self.lock = threading.Lock()
+        self.stock_lock = threading.Lock()
+        logging.info("Sharded DataLayer started [%s shard(s) | Partition: %s]", len(self.connections), partition)
+
+    def shard_key(self, text):
+        return zlib.crc32(text.encode("utf-8")) % len(self.connections)
+
+    def shard_of(self, product_data):
+        if self.partition == "id":
+            return self.shard_key(product_data["ID"])
+        shard = self.shard_key(product_data["category"])
+        self.locations[product_data["ID"]] = shard
+        return shard
+
+    def shard_of_id(self, i_d):
+        if self.partition == "id":
+            return self.shard_key(i_d)
+        return self.locations.get(i_d)
+
+    def shards_for(self, field, value):
+        if self.partition == "category" and field == "Category":
+            return [self.shard_key(value)]
+        return None
+
+    def call(self, shard, command, *args):
+        return self.scatter({shard: (command, args)})[shard]
+
+    def broadcast(self, command, *args, shards=None):
+        targets = range(len(self.connections)) if shards is None else shards
+        results = self.scatter({shard: (command, args) for shard in targets})
+        return [results[shard] for shard in targets]
+
+    def scatter(self, calls):
+        shards = sorted(calls)
+        for shard in shards:
+            self.shard_locks[shard].acquire()
+        try:
+            for shard in shards:
+                self.connections[shard].send(calls[shard])
+            replies = {shard: self.connections[shard].recv() for shard in shards}
+        finally:
+            for shard in shards:
+                self.shard_locks[shard].release()
+        results, failures = {}, []
+        for shard, (is_done, result, events) in replies.items():
+            if events:
+                with self.lock:
+                    self.pending_events.extend((event, self.Product(*row), threshold) for event, row, threshold in events)
+            if not is_done:
+                failures.append(f"Shard {shard} failed: {result}")
+            results[shard] = result
+        if failures:
+            raise RuntimeError(" | ".join(failures))
+        return results
+
+    def write_locked(self):
+        return self.lock
+
+    def set_reorder_threshold(self, threshold, category=None, i_d=None):
+        if i_d is not None:
+            shard = self.shard_of_id(i_d)
+            shards = [shard] if shard is not None else []
+        else:
+            shards = None
+        count = sum(self.broadcast("set_reorder_threshold", threshold, category, i_d, shards=shards))
+        if category is None and i_d is None:
+            self.low_stock_limit = threshold
+        self.bump("stock")
+        self.fire_events()
+        logging.info("Reorder threshold set to [%s] on shards | Category: %s | ID: %s", threshold, category, i_d)
+        return count
+
+    def low_stock_products(self):
+        return [self.Product(*row) for row in heapq.merge(*self.broadcast("low_stock"), key=itemgetter(6))]
+
+    def bump(self, *index_names):
+        with self.lock:
+            super().bump(*index_names)
+
+    def get_product(self):
+        logging.debug("Returning Product Mapping (sharded)")
         return self.products
 
+    def reserve_id_counter(self, prefix):
+        with self.lock:
+            counter = self.id_counters.get(prefix, 1)
+            self.id_counters[prefix] = counter + 1
+            return counter
+
+    def add_product(self, product_data):
+        self.add_products([product_data])
+        if logging.root.isEnabledFor(logging.INFO):
+            logging.info("Product Added successfully [ID: %s | Name: %s]\n", product_data["ID"], product_data["name"])
+
+    def add_products(self, batch):
+        batches = defaultdict(list)
+        with self.lock:
+            for product_data in batch:
+                batches[self.shard_of(product_data)].append(dict(product_data))
+                self.track_id(product_data["ID"])
+                for field, attribute in self.facet_attributes.items():
+                    self.facet_keys[field].add(product_data[attribute])
+        count = sum(self.scatter({shard: ("add_products", (rows,)) for shard, rows in batches.items()}).values())
+        self.bump(*self.generations)
+        self.fire_events()
+        logging.info("Batch of [%s] product(s) added across [%s] shard(s)\n", count, len(batches))
+        return count
+
+    def adjust_stock(self, key, delta):
+        shard = self.shard_of_id(key)
+        with self.stock_lock:
+            row = self.call(shard, "adjust_stock", key, delta) if shard is not None else None
+        if row is None:
+            logging.warning("Stock of [%s] not adjusted by [%+d] | Missing product or stock below zero", key, delta)
+            return None
+        self.bump("stock")
+        self.fire_events()
+        return self.Product(*row)
+
+    def update_stock(self, key, stock):
+        with self.stock_lock:
+            row = self.call(self.shard_of_id(key), "update_stock", key, stock)
+        self.bump("stock")
+        self.fire_events()
+        return self.Product(*row)
+
+    def apply_stock_deltas(self, deltas):
+        groups = defaultdict(dict)
+        for key, delta in deltas.items():
+            shard = self.shard_of_id(key)
+            if shard is None:
+                logging.warning("Stock movement on [%s] rejected | Missing product", key)
+                return None
+            groups[shard][key] = delta
+        with self.stock_lock:
+            checked = self.scatter({shard: ("stock_levels", (list(group),)) for shard, group in groups.items()})
+            current = {}
+            for levels in checked.values():
+                current.update(levels)
+            for key, delta in deltas.items():
+                if key not in current or current[key] + delta < 0:
+                    logging.warning("Stock movement on [%s] rejected | Missing product or stock below zero", key)
+                    return None
+            new_stocks = {}
+            for shard_stocks in self.scatter({shard: ("apply_stock_deltas", (group,))
+                                              for shard, group in groups.items()}).values():
+                new_stocks.update(shard_stocks)
+        self.bump("stock")
+        self.fire_events()
+        return new_stocks
+
+    def analysis_snapshot(self):
+        logging.debug("Merging analysis from [%s] shard(s)", len(self.connections))
+        count_category, count_sub_category, count_company = Counter(), Counter(), Counter()
+        low_count, low_stocks_full, category_stock = 0, {}, Counter()
+        for part in self.broadcast("analysis"):
+            count_category.update(part[0])
+            count_sub_category.update(part[1])
+            count_company.update(part[2])
+            low_count += part[3]
+            low_stocks_full.update(part[4])
+            category_stock.update(part[5])
+        avg_stocks_per_category = {k: category_stock[k] / v for k, v in count_category.items()}
+        return count_category, count_sub_category, count_company, low_count, low_stocks_full, avg_stocks_per_category
+
+    def range_count(self, field, lo=None, hi=None):
+        return sum(self.broadcast("range_count", field, lo, hi))
+
+    def range_products(self, field, lo=None, hi=None):
+        position = self.Product._fields.index(field)
+        return [self.Product(*row) for row in heapq.merge(*self.broadcast("range_rows", field, lo, hi),
+                                                          key=itemgetter(position))]
+
+    def range_ids(self, field, lo=None, hi=None):
+        return [product.ID for product in self.range_products(field, lo, hi)]
+
+    def page_products(self, sort_by, descending=False, cursor=None, limit=50):
+        rows = heapq.merge(*self.broadcast("page_products", sort_by, descending, cursor, limit),
+                           key=itemgetter(self.Product._fields.index(sort_by), 0), reverse=descending)
+        return [self.Product(*row) for row in islice(rows, limit)]
+
+    def fetch_products(self, ids):
+        ids = list(ids)
+        groups = defaultdict(list)
+        for p_id in ids:
+            groups[self.shard_of_id(p_id)].append(p_id)
+        groups.pop(None, None)
+        rows = {}
+        for shard_rows in self.scatter({shard: ("fetch", (shard_ids,)) for shard, shard_ids in groups.items()}).values():
+            rows.update((row[0], row) for row in shard_rows)
+        return [self.Product(*rows[p_id]) for p_id in ids if p_id in rows]
+
+    def search_ids(self, term):
+        matching_ids = set()
+        for shard_ids in self.broadcast("search_ids", term):
+            matching_ids.update(shard_ids)
+        logging.debug("[%s] matched [%s] product(s) across shards", term, len(matching_ids))
+        return matching_ids
+
+    def suggest_terms(self, term, limit=5):
+        return merge_suggestions(self.broadcast("suggest_terms", term, limit), limit)
+
+    def facet_matches(self, field, prefix=""):
+        counts = Counter()
+        for matches in self.broadcast("facet_matches", field, prefix):
+            counts.update(dict(matches))
+        return sorted(counts.items(), key=lambda item: (item[0].casefold(), item[0]))
+
+    def facet_page(self, field, prefix="", offset=0, limit=10):
+        offset = max(0, offset)
+        with self.lock:
+            start, end = self.facet_keys[field].bounds(prefix)
+        heads = self.broadcast("facet_page", field, prefix, offset + limit)
+        merged = heapq.merge(*heads, key=lambda item: (item[0].casefold(), item[0]))
+        values = ((value, sum(count for _, count in group)) for value, group in groupby(merged, key=itemgetter(0)))
+        return end - start, list(islice(values, offset, offset + limit))
+
+    def search_names(self, term):
+        matching_ids = set()
+        for shard_ids in self.broadcast("search_names", term):
+            matching_ids.update(shard_ids)
+        return matching_ids
+
+    def query_products(self, facets, name=None, ranges=None):
+        shards = self.shards_for("Category", facets["Category"]) if "Category" in facets else None
+        for rows in self.broadcast("query", facets, name, ranges, shards=shards):
+            for row in rows:
+                yield self.Product(*row)
+
+    def flush(self):
+        logging.debug("Shards keep their products in memory | Nothing to flush")
+
+    def close(self):
+        for shard, connection in enumerate(self.connections):
+            with self.shard_locks[shard]:
+                try:
+                    connection.send(("close", ()))
+                    connection.recv()
+                except (EOFError, OSError):
+                    logging.warning("Shard [%s] already gone", shard)
+                connection.close()
+        for process in self.processes:
+            process.join()
+        self.log_listener.stop()
+        logging.info("Sharded DataLayer closed")
+
 
 class ValidationLayer:
     def positive_integer(self, value):
@@ -102,21 +2969,188 @@ class ValidationLayer:
         logging.info("Input is not empty | Returning")
         return True, value.strip().capitalize()
 
+    def existing_file(self, value):
+        logging.debug("Checking for an existing file")
+        if len(value.strip()) == 0:
+            logging.warning("Input is empty | Returning")
+            return False, "Input cannot be empty"
+        if not os.path.isfile(value.strip()):
+            logging.warning("File does not exist | Returning")
+            return False, "File does not exist"
+        logging.info("File exists | Returning Path")
+        return True, value.strip()
+
+class ResultCache:
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, key, stamp):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            if entry[0] != stamp:
+                del self.entries[key]
+                self.invalidations += 1
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key, stamp, value):
+        with self.lock:
+            self.entries[key] = (stamp, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def stats(self):
+        with self.lock:
+            return {"entries": len(self.entries), "hits": self.hits, "misses": self.misses,
+                    "evictions": self.evictions, "invalidations": self.invalidations}
+
+
+class MovementSeries:
+    __slots__ = ("capacity", "times", "deltas", "start", "size", "in_window", "units_in", "units_out", "first_seen")
+
+    def __init__(self, capacity, timestamp):
+        self.capacity = capacity
+        self.times = array("d")
+        self.deltas = array("q")
+        self.start = 0
+        self.size = 0
+        self.in_window = 0
+        self.units_in = 0
+        self.units_out = 0
+        self.first_seen = timestamp
+
+    def count(self, position, sign):
+        delta = self.deltas[position]
+        if delta > 0:
+            self.units_in += delta * sign
+        else:
+            self.units_out -= delta * sign
+
+    def append(self, timestamp, delta):
+        if len(self.times) < self.capacity:
+            position = len(self.times)
+            self.times.append(timestamp)
+            self.deltas.append(delta)
+        else:
+            if self.size == self.capacity:
+                if self.in_window == self.size:
+                    self.count(self.start, -1)
+                    self.in_window -= 1
+                self.start = (self.start + 1) % self.capacity
+                self.size -= 1
+            position = (self.start + self.size) % self.capacity
+            self.times[position] = timestamp
+            self.deltas[position] = delta
+        self.size += 1
+        self.in_window += 1
+        self.count(position, 1)
+
+    def expire(self, cutoff):
+        capacity = len(self.times)
+        while self.in_window:
+            position = (self.start + self.size - self.in_window) % capacity
+            if self.times[position] >= cutoff:
+                return
+            self.count(position, -1)
+            self.in_window -= 1
+
+    def span(self, now, window):
+        span = max(86400.0, min(window, now - self.first_seen))
+        if self.size == self.capacity and self.in_window == self.size:
+            span = min(span, max(3600.0, now - self.times[self.start]))
+        return span
+
+    def movements(self):
+        capacity = len(self.times)
+        return [(self.times[(self.start + i) % capacity], self.deltas[(self.start + i) % capacity])
+                for i in range(self.size)]
+
+
+class StockHistory:
+    def __init__(self, capacity=64, window_days=7, clock=time.time):
+        self.capacity = capacity
+        self.window = window_days * 86400
+        self.clock = clock
+        self.series = {}
+        self.lock = threading.Lock()
+
+    def record(self, i_d, delta, timestamp=None):
+        if not delta:
+            return
+        timestamp = self.clock() if timestamp is None else timestamp
+        with self.lock:
+            series = self.series.get(i_d)
+            if series is None:
+                series = self.series[i_d] = MovementSeries(self.capacity, timestamp)
+            series.append(timestamp, delta)
+            series.expire(timestamp - self.window)
+
+    def movements(self, i_d):
+        with self.lock:
+            series = self.series.get(i_d)
+            return series.movements() if series else []
+
+    def forecast(self, i_d, stock, now=None):
+        now = self.clock() if now is None else now
+        with self.lock:
+            series = self.series.get(i_d)
+            if series is None:
+                return None
+            series.expire(now - self.window)
+            days = series.span(now, self.window) / 86400
+            units_in, units_out = series.units_in, series.units_out
+        out_per_day = units_out / days
+        days_of_cover = stock / out_per_day if out_per_day else None
+        return {"units_in": units_in, "units_out": units_out, "in_per_day": units_in / days,
+                "out_per_day": out_per_day, "days_of_cover": days_of_cover,
+                "stockout_at": now + days_of_cover * 86400 if days_of_cover is not None else None}
+
+    def tracked_ids(self):
+        with self.lock:
+            return list(self.series)
+
+
 class OperationLayer:
-    def __init__(self, data_layer=None):
+    def __init__(self, data_layer=None, cache_size=256, history_size=64, window_days=7):
         self.dl = data_layer if data_layer else DataLayer()
         self.vl = ValidationLayer()
         self.product_db = {}
+        self.cache = ResultCache(cache_size)
+        self.history = StockHistory(history_size, window_days)
 
     def check_validity(self, data, validation):
-        logging.debug(f"Passing Data for Validation")
+        logging.debug("Passing Data for Validation")
         return validation(data)
 
     def create_id(self, product_data, counter):
         p_name, p_category, p_subcategory = product_data[0], product_data[2], product_data[3]
         no = counter
-        i_d = f"{no:04}{p_name[0]}{p_category[0]}{p_subcategory[0]}"
-        logging.info(f"ID created successfully[{i_d}]\n")
+        i_d = f"{no:0{self.dl.id_width}}{p_name[0]}{p_category[0]}{p_subcategory[0]}"
+        if logging.root.isEnabledFor(logging.INFO):
+            logging.info("ID created successfully[%s]\n", i_d)
+        return i_d
+
+    def allocate_id(self, product_data):
+        p_name, p_category, p_subcategory = product_data[0], product_data[2], product_data[3]
+        prefix = f"{p_name[0]}{p_category[0]}{p_subcategory[0]}"
+        i_d = self.create_id(product_data, self.dl.reserve_id_counter(prefix))
+        while self.check_id(i_d):
+            logging.warning("ID [%s] already taken outside the allocator | Trying next counter", i_d)
+            i_d = self.create_id(product_data, self.dl.reserve_id_counter(prefix))
         return i_d
 
     def create_product_db(self, product_list):
@@ -128,7 +3162,7 @@ class OperationLayer:
         self.product_db["stock"] = product_list[5]
         self.product_db["ID"] = product_list[6]
         self.dl.add_product(self.product_db)
-        logging.info(f"Product[{self.product_db["name"]}] has been registered in database | Passing to Inventory")
+        logging.info("Product[%s] has been registered in database | Passing to Inventory", self.product_db["name"])
         return self.product_db
 
     def check_id(self, i_d):
@@ -137,33 +3171,64 @@ class OperationLayer:
 
     def check_name(self, p_name):
         logging.debug("Checking for duplicate names")
-        return any(p_name == name for name in self.dl.products_names)
+        return p_name in self.dl.name_index
+
+    def get_product_by_id(self, i_d):
+        logging.debug("Looking up product by ID [%s]", i_d)
+        return self.dl.products.get(i_d)
+
+    def get_products_by_name(self, p_name):
+        logging.debug("Looking up product(s) by name [%s]", p_name)
+        return self.dl.fetch_products(self.dl.name_index.get(p_name, []))
+
+    def restock(self, stock_a, i_d=None, p_name=None):
+        if i_d is None:
+            ids = self.dl.name_index.get(p_name, [])
+            if not ids:
+                logging.warning("No product named [%s] | Returning", p_name)
+                return False, f"No product named {p_name}"
+            if len(ids) > 1:
+                logging.warning("Name [%s] is shared by %s products | Returning", p_name, len(ids))
+                return False, f"{len(ids)} products are named {p_name} | Specify an ID"
+            i_d = ids[0]
+
+        if not self.check_id(i_d):
+            logging.warning("No product with ID [%s] | Returning", i_d)
+            return False, f"No product with ID {i_d}"
+        new_stock = self.add_stocks(stock_a, i_d)
+        if new_stock is None:
+            return False, "Stock cannot go below zero"
+        return True, new_stock
 
     def search_data(self, p_data):
-        matching_ids = set()
-        logging.info(f"Searching data [{p_data}] in Inventory")
-        for search_term in [p_data.upper(), p_data.capitalize()]:
-            if search_term in self.dl.company:
-                logging.debug(f"[{p_data}] Found in Product Company")
-                matching_ids.update(self.dl.company[search_term])
-
-            if search_term in self.dl.category:
-                logging.debug(f"[{p_data}] Found in Product Category")
-                matching_ids.update(self.dl.category[search_term])
-
-            if search_term in self.dl.sub_category:
-                logging.debug(f"[{p_data}] Found in Product Sub-category")
-                matching_ids.update(self.dl.sub_category[search_term])
-
-            for product_id, product in self.dl.products.items():
-                if search_term in product.name:
-                    logging.debug(f"[{p_data}] Found in Product Names")
-                    matching_ids.add(product_id)
-
-        selected_products = [self.dl.products[p_id] for p_id in matching_ids]
+        logging.info("Searching data [%s] in Inventory", p_data)
+        selected_products = self.dl.fetch_products(self.search_matches(p_data))
         logging.info("Returning Results\n")
         return selected_products if selected_products else None
 
+    def search_matches(self, p_data):
+        search_terms = tuple(dict.fromkeys((p_data.upper(), p_data.capitalize())))
+        stamp = self.dl.stamp(("Company", "Category", "Sub-Category", "name"))
+        matching_ids = self.cache.get(("search", search_terms), stamp)
+        if matching_ids is None:
+            matching_ids = set()
+            for search_term in search_terms:
+                matching_ids.update(self.dl.search_ids(search_term))
+            self.cache.put(("search", search_terms), stamp, matching_ids)
+        else:
+            logging.debug("Search [%s] served from cache", p_data)
+        return matching_ids
+
+    def suggest_terms(self, p_data, limit=5):
+        suggestions = []
+        for term, _, _ in self.dl.suggest_terms(p_data, limit * 2):
+            if term not in (term.upper(), term.capitalize()):
+                term = term.capitalize()
+            if term not in suggestions and self.search_matches(term):
+                suggestions.append(term)
+        logging.info("[%s] close match(es) for [%s]: %s", len(suggestions[:limit]), p_data, suggestions[:limit])
+        return suggestions[:limit]
+
     def check_empty_product(self):
         logging.info("Returning Product Inventory")
         return self.dl.get_product()
@@ -172,36 +3237,354 @@ class OperationLayer:
         logging.info("Returning Product Fields\n")
         return self.dl.all_search_fields
 
+    def query(self, company=None, category=None, sub_category=None, name=None, price=None, stock=None):
+        facets = {field: value for field, value in (("Company", company), ("Category", category),
+                                                    ("Sub-Category", sub_category)) if value is not None}
+        ranges = {field: bounds for field, bounds in (("price", price), ("stock", stock)) if bounds is not None}
+        logging.info("Compound query | Facets: %s | Name: %s | Ranges: %s", facets, name, ranges)
+        return self.dl.query_products(facets, name, ranges)
+
+    def get_facet_values(self, field):
+        logging.debug("Decoding values of [%s]", field)
+        return [self.dl.decode(code) for code in list(self.dl.all_search_fields[field])]
+
+    def browse_facet(self, field, prefix="", page=0, page_size=10, products=None):
+        if products is None:
+            total, values = self.dl.facet_page(field, prefix, page * page_size, page_size)
+        else:
+            attribute = self.dl.facet_attributes[field]
+            prefix_index = PrefixIndex()
+            for product in products:
+                prefix_index.add(getattr(product, attribute))
+            total, values = prefix_index.page(prefix, page * page_size, page_size)
+        logging.debug("[%s] %s value(s) start with [%s] | Page %s", total, field, prefix, page + 1)
+        return total, values
+
+    def get_facet_ids(self, field, value):
+        code = self.dl.code_of(value)
+        if code is None:
+            return []
+        return list(self.dl.all_search_fields[field].get(code, []))
+
+    def get_facet_products(self, field, value):
+        stamp = self.dl.stamp((field,))
+        matching_ids = self.cache.get(("facet", field, value), stamp)
+        if matching_ids is None:
+            matching_ids = [v.ID for v in self.query(**{self.dl.facet_attributes[field]: value})]
+            self.cache.put(("facet", field, value), stamp, matching_ids)
+        return self.dl.fetch_products(matching_ids)
+
+    def cache_stats(self):
+        return self.cache.stats()
+
+    def get_subset_facet_values(self, products, field):
+        attribute = self.dl.facet_attributes[field]
+        return [self.dl.decode(code) for code in {self.dl.product_code(v, attribute) for v in products}]
+
+    def filter_facet(self, products, field, value):
+        attribute = self.dl.facet_attributes[field]
+        column = getattr(self.dl.products, "code_columns", {}).get(attribute)
+        if column is None:
+            logging.debug("Filtering [%s] by value [%s]", field, value)
+            return [v for v in products if getattr(v, attribute) == value]
+        code = self.dl.code_of(value)
+        logging.debug("Filtering [%s] by code [%s]", field, code)
+        return [v for v in products if column[v.row] == code]
+
     def add_product(self, product_data):
-        logging.debug(f"Product data Successfully added to inventory\n")
+        logging.debug("Product data Successfully added to inventory\n")
         self.dl.add_product(product_data)
         return "Product Added Successfully"
 
-    def add_stocks(self, stock_a, key, product):
+    def read_import_rows(self, stream, file_format):
+        if file_format == "csv":
+            reader = csv.DictReader(stream)
+            for row in reader:
+                yield reader.line_num, row, None
+            return
+
+        for line_no, line in enumerate(stream, start=1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError as error:
+                yield line_no, line.rstrip("\n"), f"Invalid JSON: {error}"
+                continue
+            yield line_no, row, None if isinstance(row, dict) else "Row must be a JSON object"
+
+    def validate_import_row(self, row):
+        checks = [("name", self.vl.string_non_empty), ("company", self.vl.string_non_empty),
+                  ("category", self.vl.string_non_empty), ("sub_category", self.vl.string_non_empty),
+                  ("price", self.vl.positive_number), ("stock", self.vl.positive_integer)]
+        product_list = []
+        for field, validation in checks:
+            value = row.get(field)
+            if value is None:
+                return False, f"Missing field: {field}"
+            is_valid, info = self.check_validity(str(value).strip(), validation)
+            if not is_valid:
+                return False, f"{field}: {info}"
+            product_list.append(info)
+        return True, product_list
+
+    def bulk_import(self, path_or_stream, format=None, batch_size=1000, reject_path=None):
+        if isinstance(path_or_stream, (str, os.PathLike)):
+            path = os.fspath(path_or_stream)
+            file_format = format or ("jsonl" if path.lower().endswith((".jsonl", ".json")) else "csv")
+            with open(path, newline="", encoding="utf-8") as stream:
+                return self.bulk_import(stream, file_format, batch_size, reject_path or f"{path}.rejects.jsonl")
+
+        file_format = (format or "csv").lower()
+        if file_format not in ("csv", "jsonl"):
+            logging.error("Unsupported import format [%s] | Returning", file_format)
+            return None
+
+        logging.info("Importing products [%s] in batches of %s", file_format, batch_size)
+        imported, rejected, batch = 0, 0, []
+        reject_file = None
+        try:
+            for line_no, row, error in self.read_import_rows(path_or_stream, file_format):
+                if error is None:
+                    is_valid, info = self.validate_import_row(row)
+                    error = None if is_valid else info
+
+                if error:
+                    rejected += 1
+                    if logging.root.isEnabledFor(logging.INFO):
+                        logging.info("Rejected import row [%s]: %s", line_no, error)
+                    if reject_path:
+                        if reject_file is None:
+                            reject_file = open(reject_path, "w", encoding="utf-8")
+                        reject_file.write(json.dumps({"line": line_no, "error": error, "row": row}) + "\n")
+                    continue
+
+                info.append(self.allocate_id(info))
+                batch.append(dict(zip(["name", "company", "category", "sub_category", "price", "stock", "ID"], info)))
+                if len(batch) >= batch_size:
+                    imported += self.dl.add_products(batch)
+                    batch = []
+
+            if batch:
+                imported += self.dl.add_products(batch)
+            self.dl.flush()
+        finally:
+            if reject_file:
+                reject_file.close()
+
+        logging.info("Import complete | Imported: %s | Rejected: %s\n", imported, rejected)
+        return {"imported": imported, "rejected": rejected, "reject_path": reject_path if rejected else None}
+
+    def list_products(self, sort_by="ID", descending=False, cursor=None, page_size=50):
+        if sort_by not in ("ID", "name", "price", "stock"):
+            logging.error("Cannot sort products by [%s] | Returning", sort_by)
+            return None
+        page = self.dl.page_products(sort_by, descending, tuple(cursor) if cursor is not None else None,
+                                     page_size + 1)
+        next_cursor = attrgetter(sort_by, "ID")(page[page_size - 1]) if len(page) > page_size else None
+        logging.debug("Listing page of [%s] product(s) by [%s] | More: %s", min(len(page), page_size), sort_by,
+                      next_cursor is not None)
+        return page[:page_size], next_cursor
+
+    def iter_product_pages(self, sort_by="ID", descending=False, page_size=50):
+        cursor = None
+        while True:
+            page, cursor = self.list_products(sort_by, descending, cursor, page_size)
+            if page:
+                yield page
+            if cursor is None:
+                return
+
+    def export_products(self, path_or_stream, format=None, sort_by=None, chunk_size=1000):
+        if isinstance(path_or_stream, (str, os.PathLike)):
+            path = os.fspath(path_or_stream)
+            file_format = format or ("jsonl" if path.lower().endswith((".jsonl", ".json")) else "csv")
+            with open(path, "w", newline="", encoding="utf-8", buffering=1024 * 1024) as stream:
+                summary = self.export_products(stream, file_format, sort_by, chunk_size)
+            summary["path"] = path
+            return summary
+
+        file_format = (format or "csv").lower()
+        if file_format not in ("csv", "jsonl"):
+            logging.error("Unsupported export format [%s] | Returning", file_format)
+            return None
+        if sort_by not in (None, "ID", "name", "price", "stock"):
+            logging.error("Cannot sort products by [%s] | Returning", sort_by)
+            return None
+
+        if sort_by is not None:
+            products = chain.from_iterable(self.iter_product_pages(sort_by, page_size=chunk_size))
+        else:
+            products = iter(self.dl.get_product().values())
+        logging.info("Exporting products [%s] in chunks of %s | Sorted by: %s", file_format, chunk_size, sort_by)
+        writer = csv.writer(path_or_stream) if file_format == "csv" else None
+        if writer:
+            writer.writerow(PRODUCT_FIELDS)
+        exported = 0
+        while True:
+            chunk = [tuple(product) for product in islice(products, chunk_size)]
+            if not chunk:
+                break
+            if writer:
+                writer.writerows(chunk)
+            else:
+                path_or_stream.write("".join(json.dumps(dict(zip(PRODUCT_FIELDS, row))) + "\n" for row in chunk))
+            exported += len(chunk)
+
+        logging.info("Export complete | Exported: %s", exported)
+        return {"exported": exported, "format": file_format, "path": None}
+
+    def add_stocks(self, stock_a, key):
         stock_amount = int(stock_a)
-        logging.debug("Replacing old stock with new stock")
-        updated_product = product._replace(stock=product.stock + stock_amount)
-        self.dl.products[key] = updated_product
+        logging.debug("Adjusting stock by [%s]", stock_amount)
+        updated_product = self.dl.adjust_stock(key, stock_amount)
+        if updated_product is None:
+            logging.warning("Stock adjustment rejected | Returning\n")
+            return None
+        self.history.record(updated_product.ID, stock_amount)
         logging.info("Operation successful| Returning\n")
-        return  self.dl.products[key].stock
+        return updated_product.stock
+
+    def resolve_product(self, key):
+        if self.check_id(key):
+            return key, None
+        ids = self.dl.name_index.get(key, [])
+        if not ids:
+            return None, "Unknown ID or name"
+        if len(ids) > 1:
+            return None, f"{len(ids)} products are named {key} | Use an ID"
+        return ids[0], None
+
+    def apply_stock_movements(self, movements):
+        deltas, rejected, resolved, last_position, count = {}, [], {}, {}, 0
+        for position, (key, delta) in enumerate(movements):
+            count += 1
+            if not isinstance(key, str):
+                rejected.append((position, key, "ID or name must be a string"))
+                continue
+            if isinstance(delta, bool) or not isinstance(delta, int):
+                rejected.append((position, key, "Delta must be an integer"))
+                continue
+            if key not in resolved:
+                resolved[key] = self.resolve_product(key)
+            i_d, error = resolved[key]
+            if error:
+                rejected.append((position, key, error))
+                continue
+            deltas[i_d] = deltas.get(i_d, 0) + delta
+            last_position[i_d] = position
+
+        if not rejected:
+            for product in self.dl.fetch_products(deltas):
+                if product.stock + deltas[product.ID] < 0:
+                    rejected.append((last_position[product.ID], product.ID,
+                                     f"Stock would drop to {product.stock + deltas[product.ID]}"))
+            rejected.sort(key=itemgetter(0))
+        if rejected:
+            logging.warning("Stock movements rejected | Movements: %s | Rejected: %s", count, len(rejected))
+            return False, rejected
+
+        new_stocks = self.dl.apply_stock_deltas(deltas)
+        if new_stocks is None:
+            return False, [(None, None, "Stock changed while applying | Nothing applied")]
+        timestamp = self.history.clock()
+        for i_d, delta in deltas.items():
+            self.history.record(i_d, delta, timestamp)
+        logging.info("Stock movements applied | Movements: %s | Products: %s | Net change: %+d",
+                     count, len(new_stocks), sum(deltas.values()))
+        return True, new_stocks
+
+    def set_reorder_threshold(self, threshold, category=None, i_d=None):
+        if threshold is not None and (isinstance(threshold, bool) or not isinstance(threshold, int) or threshold < 0):
+            logging.warning("Invalid reorder threshold [%s] | Returning", threshold)
+            return False, "Threshold must be a non-negative integer"
+        if not all(value is None or isinstance(value, str) for value in (category, i_d)):
+            return False, "Category and ID must be text"
+        if category is not None:
+            category = category.strip().capitalize()
+        if threshold is None and category is None and i_d is None:
+            return False, "The global threshold cannot be cleared"
+        if i_d is not None and not self.check_id(i_d):
+            logging.warning("No product with ID [%s] | Returning", i_d)
+            return False, f"No product with ID {i_d}"
+        return True, self.dl.set_reorder_threshold(threshold, category, i_d)
+
+    def stock_movements(self, key):
+        i_d, error = self.resolve_product(key)
+        if error:
+            return False, error
+        return True, self.history.movements(i_d)
+
+    def stock_forecast(self, key):
+        i_d, error = self.resolve_product(key)
+        if error:
+            return False, error
+        forecast = self.history.forecast(i_d, self.dl.products[i_d].stock)
+        if forecast is None:
+            return False, f"No stock movements recorded for {i_d}"
+        return True, forecast
+
+    def running_out(self, days=7, now=None):
+        now = self.history.clock() if now is None else now
+        at_risk = []
+        for product in self.dl.fetch_products(self.history.tracked_ids()):
+            forecast = self.history.forecast(product.ID, product.stock, now)
+            if forecast["days_of_cover"] is not None and forecast["days_of_cover"] <= days:
+                at_risk.append((product, forecast))
+        at_risk.sort(key=lambda item: item[1]["days_of_cover"])
+        logging.info("[%s] product(s) projected to run out within %s day(s)", len(at_risk), days)
+        return at_risk
+
+    def get_low_stock(self):
+        logging.debug("Reading the live low-stock set")
+        return self.dl.low_stock_products()
+
+    def on_stock_event(self, callback):
+        self.dl.add_stock_listener(callback)
+
+    def range_query(self, field, lo=None, hi=None):
+        if field not in self.dl.sorted_fields:
+            logging.error("No sorted index for field [%s] | Returning", field)
+            return None
+        logging.info("Range query on [%s] between [%s] and [%s]", field, lo, hi)
+        return self.dl.range_products(field, lo, hi)
+
+    def filter_range(self, field, lo=None, hi=None, products=None):
+        if products is None:
+            return self.range_query(field, lo, hi)
+
+        if len(products) <= self.dl.range_count(field, lo, hi):
+            logging.debug("Subset smaller than range | Filtering [%s] linearly", field)
+            return [v for v in products
+                    if (lo is None or getattr(v, field) >= lo) and (hi is None or getattr(v, field) <= hi)]
+
+        logging.debug("Range smaller than subset | Filtering [%s] through sorted index", field)
+        subset_ids = {v.ID for v in products}
+        return [v for v in self.range_query(field, lo, hi) if v.ID in subset_ids]
 
     def inventory_analysis(self):
         if not self.dl.products:
             return
         logging.info("Loading Inventory Analysis")
-        count_category = Counter(v.category for v in self.dl.products.values())
-        count_sub_category = Counter(v.sub_category for v in self.dl.products.values())
-        count_company = Counter(v.company for v in self.dl.products.values())
-        count_low_stocks = sum(1 if p.stock < 10 else 0 for p in self.dl.products.values())
-        count_low_stocks_full = {p.name : p.stock for p in self.dl.products.values() if p.stock < 10}
-        total_stocks_per_category = {}
-
-        for v in self.dl.products.values():
-            total_stocks_per_category[v.category] = total_stocks_per_category.get(v.category, 0) + v.stock
-        avg_stocks_per_category = {k: total_stocks_per_category[k]/count_category[k] for  k in count_category.keys()}
+        stamp = self.dl.stamp(("Company", "Category", "Sub-Category", "stock"))
+        analysis = self.cache.get(("analysis",), stamp)
+        if analysis is None:
+            analysis = self.dl.analysis_snapshot()
+            self.cache.put(("analysis",), stamp, analysis)
         logging.info("Analysis complete | Returning analysis")
-        return (count_category, count_sub_category, count_company, count_low_stocks, count_low_stocks_full,
-                avg_stocks_per_category)
+        return analysis
+
+    def inventory_report(self, percentiles=(25, 50, 75, 90, 99), bins=10):
+        if not self.dl.products:
+            return
+        stamp = self.dl.stamp(("Company", "Category", "Sub-Category", "price", "stock"))
+        report = self.cache.get(("report", tuple(percentiles), bins), stamp)
+        if report is None:
+            report = analytics.inventory_report(self.dl, percentiles, bins)
+            self.cache.put(("report", tuple(percentiles), bins), stamp, report)
+        else:
+            logging.debug("Inventory report served from cache")
+        return report
 
 
 class UserInterfaceLayer:
@@ -215,6 +3598,30 @@ class UserInterfaceLayer:
             print(f"{k} | Count: {v}")
         print()
 
+    def display_valuation(self, report):
+        if not report:
+            return
+        print(f"Stock Value: ${report['total_value']:,.2f} | Units in Stock: {report['total_stock']}")
+        for heading, key in (("Category", "value_by_category"), ("Company", "value_by_company")):
+            print(f"Stock Value by {heading}")
+            for name, group in report[key].items():
+                print(f"{name} | Value: ${group['value']:,.2f} | Stock: {group['stock']}")
+            print()
+        for field, label in (("price", "Price"), ("stock", "Stock")):
+            ranks = " | ".join(f"p{p}: {v:,.2f}" for p, v in report[field]["percentiles"].items())
+            print(f"{label} Percentiles: {ranks}")
+        print()
+
+    def display_running_out(self, at_risk, limit=10):
+        if not at_risk:
+            return
+        print(f"Projected to run out this week: {len(at_risk)}")
+        for product, forecast in at_risk[:limit]:
+            print(f"{product.name} (ID: {product.ID}) | Stock: {product.stock} | "
+                  f"Selling {forecast['out_per_day']:.1f}/day | Cover: {forecast['days_of_cover']:.1f} day(s) | "
+                  f"Out by: {time.strftime('%Y-%m-%d', time.localtime(forecast['stockout_at']))}")
+        print()
+
     def display_summary_analysis(self):
         logging.debug("Trying to get Analysis")
         all_analysis = self.ol.inventory_analysis()
@@ -232,10 +3639,12 @@ class UserInterfaceLayer:
         self.display_summary("Sub-Category", count_sub_category)
         self.display_summary("Company", count_company)
         self.display_summary("Average Stocks Per Category", avg_stocks_per_category)
+        self.display_valuation(self.ol.inventory_report())
+        self.display_running_out(self.ol.running_out())
         if count_low_stocks < 1:
             return
 
-        print(f"Low Stocks(Below 10) are: {count_low_stocks}\nWould you like to see all Products with low stocks:")
+        print(f"Low Stocks(Below reorder point) are: {count_low_stocks}\nWould you like to see all Products with low stocks:")
         logging.debug("Waiting for user choice on: see all Products with low stocks")
         option = self.option_conflict_list([("A", "Yes"), ("B", "No")])
         if option == "B":
@@ -249,11 +3658,18 @@ class UserInterfaceLayer:
 
 
     def update_stocks(self, p_name):
-        c_key, c_product = None, None
         logging.debug("Trying to: Update Stocks")
-        for key, value in self.ol.check_empty_product().items():
-            if p_name == value.name:
-                c_key, c_product = key, value
+        matches = self.ol.get_products_by_name(p_name)
+        c_product = matches[0]
+        if len(matches) > 1:
+            logging.info("Name [%s] is shared by %s products | Waiting on User Decision", p_name, len(matches))
+            id_options = {chr(ord("A") + i): v for i, v in enumerate(matches)}
+            print(f"{len(matches)} products are named {p_name}\nSelect the one to restock:")
+            selected = self.option_conflict_list([(k, f"ID: {v.ID} | Stock: {v.stock}") for k, v in id_options.items()])
+            if not selected:
+                logging.warning("User Decided to stop the process| Returning\n")
+                return
+            c_product = id_options[selected]
 
         stock_amount = f"Current stock[{c_product.stock}]\nEnter amount to add: "
         logging.info("Checking User Input for Errors")
@@ -262,7 +3678,7 @@ class UserInterfaceLayer:
             logging.warning("User Decided to stop the process| Returning\n")
             return
         logging.info("No Errors Found")
-        new_stock = self.ol.add_stocks(stock, c_key, c_product)
+        _, new_stock = self.ol.restock(stock, i_d=c_product.ID)
         logging.info("Stocks Updated Successfully")
         print(f"Stock Added successfully\nNew stock for {p_name}: {new_stock}")
 
@@ -278,7 +3694,7 @@ class UserInterfaceLayer:
         logging.info("Waiting for User input")
 
         while choice not in option_list:
-            logging.info(f"User input not in Options| retry: {count}")
+            logging.info("User input not in Options| retry: %s", count)
             if choice.lower() == "q":
                 logging.warning("User selected 'q' to break the process| Returning\n")
                 return None
@@ -313,11 +3729,45 @@ class UserInterfaceLayer:
                 logging.debug("Returning User Input\n")
                 return options.get(choice)
 
-            logging.info(f"User input not in Options| retry: {count}")
+            logging.info("User input not in Options| retry: %s", count)
             print(f"You entered : {choice}")
             print("These are your options")
             count += 1
 
+    def facet_value_browser(self, field, products=None, page_size=10):
+        prefix, page = "", 0
+        logging.debug("Browsing [%s] values by prefix", field)
+        while True:
+            total, values = self.ol.browse_facet(field, prefix, page, page_size, products)
+            if total == 1 and prefix:
+                logging.info("Prefix [%s] matches a single %s [%s]", prefix, field, values[0][0])
+                print(f"Selected {field}: {values[0][0]}")
+                return values[0][0]
+
+            pages = max(1, -(-total // page_size))
+            print(f"{total} {field} value(s) starting with '{prefix}' | Page {page + 1} of {pages}")
+            for number, (value, count) in enumerate(values, start=1):
+                print(f"[{number}] {value} ({count} product(s))")
+            print("Type a number to select, a prefix to narrow the list, '>' next page, '<' previous page, 'q' to go back")
+            choice = input(f"Select {field}: ").strip()
+            logging.info("Waiting for User input")
+
+            if choice.lower() == "q":
+                logging.warning("User selected 'q' to break the process| Returning\n")
+                return None
+            if choice.isdigit() and 1 <= int(choice) <= len(values):
+                logging.debug("Returning User Input\n")
+                return values[int(choice) - 1][0]
+            if choice == ">":
+                page = min(page + 1, pages - 1)
+            elif choice == "<":
+                page = max(page - 1, 0)
+            elif choice and self.ol.browse_facet(field, choice, 0, 1, products)[0]:
+                prefix, page = choice, 0
+            elif choice:
+                logging.info("No %s starts with [%s]", field, choice)
+                print(f"No {field} starts with '{choice}'")
+
     def name_sorter(self, name):
         logging.debug("Trying to Sort Name Conflict")
         selection_list = [("A", "Add stocks"),
@@ -356,7 +3806,7 @@ class UserInterfaceLayer:
                 logging.info("No errors found| Returning Data\n")
                 return info
             else:
-                logging.error(f"Error Found: {info}")
+                logging.error("Error Found: %s", info)
                 print(info)
 
             if count > 2:
@@ -373,7 +3823,6 @@ class UserInterfaceLayer:
                       ]
         log_field_list = [k for k in self.ol.get_all_search().keys()]
 
-        count = 1
         print(f"\n{'=' * 7} REGISTERING PRODUCT {'=' * 7}")
         logging.debug("Checking for Errors in Product Name")
         product_name = self.error_looper("Enter product name: ", self.vl.string_non_empty)
@@ -397,10 +3846,10 @@ class UserInterfaceLayer:
             product_db.append(is_name_valid.capitalize())
 
         for index, i in enumerate(input_list):
-            logging.debug(f"Checking for Errors in Product {log_field_list[index]}")
+            logging.debug("Checking for Errors in Product %s", log_field_list[index])
             value = self.error_looper(i, self.vl.string_non_empty)
             if value:
-                logging.info(f"Product {log_field_list[index]} Registered successfully\n")
+                logging.info("Product %s Registered successfully\n", log_field_list[index])
                 product_db.append(value)
 
             else:
@@ -424,23 +3873,33 @@ class UserInterfaceLayer:
         logging.info("Product Stock registered successfully\n")
         product_db.append(stock)
 
-        logging.debug("Trying to create ID")
-        i_d = self.ol.create_id(product_db, count)
-
-        logging.info("ID created | Checking for Uniqueness")
-        while self.ol.check_id(i_d):
-            count += 1
-            i_d = self.ol.create_id(product_db, count)
+        logging.debug("Trying to allocate ID")
+        i_d = self.ol.allocate_id(product_db)
         logging.info("ID registered Successfully")
         product_db.append(i_d)
         main_db = self.ol.create_product_db(product_db)
         logging.info("All Product Database Fields Registered Successfully| Returning Product Database\n")
         return main_db
 
+    def import_products_menu(self):
+        logging.debug("Trying to import products from a file")
+        print(f"\n{'=' * 7} IMPORTING PRODUCTS {'=' * 7}")
+        path = self.error_looper("Enter catalog file path (.csv or .jsonl): ", self.vl.existing_file)
+        if not path:
+            logging.warning("User decided to break the process| Returning\n")
+            return None
+
+        summary = self.ol.bulk_import(path)
+        print(f"{summary['imported']} Product(s) imported | {summary['rejected']} row(s) rejected")
+        if summary["reject_path"]:
+            print(f"Rejected rows were written to {summary['reject_path']}")
+        return summary
+
     def display_product_menu(self):
         selection_list = [("A", "Display only Product IDs"),
                           ("B", "Display full Product Info"),
-                          ("C", "Go Back")
+                          ("C", "Export Products to a file"),
+                          ("D", "Go Back")
                           ]
         logging.debug("Trying to: Display Product")
         products = self.ol.check_empty_product()
@@ -454,22 +3913,71 @@ class UserInterfaceLayer:
         if choice == "A":
             logging.info("User decided to display all products by IDs\n")
             print(f"{'=' * 7} Product By IDs {'=' * 7}")
-            for index, k in enumerate(products.keys(), start=1):
-                print(f"[{index}] {k}")
+            self.display_product_pages("ID", False, lambda product: product.ID)
 
         elif choice == "B":
             logging.info("User decided to display all product full Information\n")
+            sort_by, descending = self.sort_order_menu()
+            if sort_by is None:
+                return
             print(f"{'=' * 7} ALL PRODUCTS {'=' * 7}")
-            for index, (i_d, product) in enumerate(products.items(), start=1):
-                print(f"[{index}] Name: {product.name}, ID: {i_d} | [Company: {product.company}, "
-                      f"Category: {product.category}, "
-                      f"Sub-Category: {product.sub_category}, "
-                      f"Price: ${product.price:.2f}, "
-                      f"Stock: {product.stock}]")
+            self.display_product_pages(sort_by, descending,
+                                       lambda product: f"Name: {product.name}, ID: {product.ID} | "
+                                                       f"[Company: {product.company}, "
+                                                       f"Category: {product.category}, "
+                                                       f"Sub-Category: {product.sub_category}, "
+                                                       f"Price: ${product.price:.2f}, "
+                                                       f"Stock: {product.stock}]")
+
+        elif choice == "C":
+            logging.info("User decided to export products\n")
+            self.export_products_menu()
         else:
             logging.warning("User decided to break the process| Returning\n")
             return
 
+    def sort_order_menu(self):
+        sort_options = {"A": ("ID", False), "B": ("name", False), "C": ("price", False), "D": ("price", True),
+                        "E": ("stock", False), "F": ("stock", True)}
+        print("Sort by: ")
+        choice = self.option_conflict_list([("A", "ID"), ("B", "Name"), ("C", "Price (low to high)"),
+                                            ("D", "Price (high to low)"), ("E", "Stock (low to high)"),
+                                            ("F", "Stock (high to low)")])
+        if not choice:
+            logging.warning("User decided to break the process| Returning\n")
+            return None, False
+        return sort_options[choice]
+
+    def display_product_pages(self, sort_by, descending, render, page_size=20):
+        index = 0
+        for page in self.ol.iter_product_pages(sort_by, descending, page_size):
+            lines = []
+            for product in page:
+                index += 1
+                lines.append(f"[{index}] {render(product)}")
+            print("\n".join(lines))
+            if len(page) < page_size:
+                break
+            if input("Press Enter for the next page or 'q' to stop: ").strip().lower() == "q":
+                logging.info("User stopped the listing after [%s] product(s)", index)
+                return
+        print(f"End of list | {index} product(s)")
+
+    def export_products_menu(self):
+        print(f"\n{'=' * 7} EXPORTING PRODUCTS {'=' * 7}")
+        path = self.error_looper("Enter export file path (.csv or .jsonl): ", self.vl.string_non_empty)
+        if not path:
+            logging.warning("User decided to break the process| Returning\n")
+            return None
+        try:
+            summary = self.ol.export_products(path)
+        except OSError as error:
+            logging.error("Export to [%s] failed: %s", path, error)
+            print(f"Could not write {path}: {error}")
+            return None
+        print(f"{summary['exported']} Product(s) exported to {summary['path']}")
+        return summary
+
     def search_product(self, products):
         logging.debug("Trying to: Search Product (Advance Search)")
         search_field_options = {chr(ord("A") + i): k for i, k in enumerate(self.ol.get_all_search().keys())}
@@ -482,21 +3990,16 @@ class UserInterfaceLayer:
             logging.warning("User decided to break the process| Returning\n")
             return None
 
-        logging.info(f"User selected [{selected_field_option}]| getting sub-fields")
-        selected_field = self.ol.get_all_search()[selected_field_option]
-        search_subfield_options = {chr(ord("A") + i): k for i, k in
-                                   enumerate(selected_field.keys())}
+        logging.info("User selected [%s]| getting sub-fields", selected_field_option)
         print(f"\n{'=' * 7} Searching in {selected_field_option} {'=' * 7}")
-        print(f"Enter specific {selected_field_option} :")
-        selected_option = self.option_conflict_dict(search_subfield_options)
+        selected_option = self.facet_value_browser(selected_field_option)
 
         if not selected_option:
             logging.warning("User decided to break the process| Returning\n")
             return None
 
-        logging.info(f"User selected [{selected_option}]| getting IDs")
-        selected_option_id = selected_field[selected_option]
-        search_product = [v for k, v in products.items() if k in selected_option_id]
+        logging.info("User selected [%s]| getting Products", selected_option)
+        search_product = self.ol.get_facet_products(selected_field_option, selected_option)
         logging.info("Returning Searched Products\n")
         return selected_option, search_product
 
@@ -517,14 +4020,14 @@ class UserInterfaceLayer:
             return None, ""
 
         if selected_range == "A":
-            logging.info(f"User Decided to Filter Price above ${filter_no:.2f}\n")
-            filter_product = [v for v in products if v.price >= round(float(filter_no), 4)]
+            logging.info("User Decided to Filter Price above $%.2f\n", filter_no)
+            filter_product = self.ol.filter_range("price", lo=round(float(filter_no), 4), products=products)
             return (filter_product, numlist[0][1]) if filter_product else (None,
                                                                            f"No Available products with {numlist[0][1]}")
         else:
-            logging.info(f"User Decided to Filter Price below ${filter_no:.2f}\n")
-            filter_product = [v for v in products if v.price <= round(float(filter_no), 4)]
-            return filter_product, numlist[1][1] if filter_product else (None,
+            logging.info("User Decided to Filter Price below $%.2f\n", filter_no)
+            filter_product = self.ol.filter_range("price", hi=round(float(filter_no), 4), products=products)
+            return (filter_product, numlist[1][1]) if filter_product else (None,
                                                                            f"No Available products with {numlist[1][1]}")
 
     def filtered_stock(self, products):
@@ -544,24 +4047,22 @@ class UserInterfaceLayer:
             return None, ""
 
         if selected_range == "A":
-            logging.info(f"User Decided to Filter Stock above ${filter_no:.2f}\n")
-            filter_product = [v for v in products if v.stock >= int(filter_no)]
-            return filter_product, numlist[0][1] if filter_product else (None,
+            logging.info("User Decided to Filter Stock above $%.2f\n", filter_no)
+            filter_product = self.ol.filter_range("stock", lo=int(filter_no), products=products)
+            return (filter_product, numlist[0][1]) if filter_product else (None,
                                                                            f"No Available products with {numlist[0][1]}")
         else:
-            logging.info(f"User Decided to Filter Stock below ${filter_no:.2f}\n")
-            filter_product = [v for v in products if v.stock <= int(filter_no)]
-            return filter_product, numlist[1][1] if filter_product else (None,
+            logging.info("User Decided to Filter Stock below $%.2f\n", filter_no)
+            filter_product = self.ol.filter_range("stock", hi=int(filter_no), products=products)
+            return (filter_product, numlist[1][1]) if filter_product else (None,
                                                                            f"No Available products with {numlist[1][1]}")
 
 
 
     def filtered_search(self, products):
         logging.debug("Trying to: Filter Product")
-        category = {chr(ord("A") + i) : j for i, j in enumerate({v.category for v in products})}
-        sub_category = {chr(ord("A") + i): j for i, j in enumerate({v.sub_category for v in products})}
-        company = {chr(ord("A") + i): j for i, j in enumerate({v.company for v in products})}
         filter_list = [(chr(ord("A") + i), k) for i, k in enumerate(self.ol.get_all_search().keys())]
+        facet_fields = dict(filter_list)
         price_op, stock_op, go_back = (chr(ord(filter_list[len(filter_list) - 1][0]) + 1),
                                        chr(ord(filter_list[len(filter_list) - 1][0]) + 2),
                                        chr(ord(filter_list[len(filter_list) - 1][0]) + 3))
@@ -594,32 +4095,15 @@ class UserInterfaceLayer:
             else:
                 return is_empty, data
 
-        elif selected_option == "A":
-            logging.info("User Decided to filter: By Category")
-            selected_category = self.option_conflict_dict(category)
-            if not selected_category:
-                return None
-
-            filter_product = [v for v in products if selected_category == v.category]
-            return filter_product, selected_category
-
-        elif selected_option == "B":
-            logging.info("User Decided to filter: By Sub-category")
-            selected_category = self.option_conflict_dict(sub_category)
-            if not selected_category:
-                return None
-
-            filter_product = [v for v in products if selected_category == v.sub_category]
-            return filter_product, selected_category
-
         else:
-            logging.info("User Decided to filter: By Company")
-            selected_category = self.option_conflict_dict(company)
-            if not selected_category:
+            selected_field = facet_fields[selected_option]
+            logging.info("User Decided to filter: By %s", selected_field)
+            selected_value = self.facet_value_browser(selected_field, products)
+            if not selected_value:
                 return None
 
-            filter_product = [v for v in products if selected_category == v.company]
-            return filter_product, selected_category
+            filter_product = self.ol.filter_facet(products, selected_field, selected_value)
+            return filter_product, selected_value
 
 
 
@@ -639,8 +4123,20 @@ class UserInterfaceLayer:
                 logging.info("Products found|returning Found products")
                 return search_term, selected_products
 
-            logging.info(f"No products found| retry[{count}]")
+            logging.info("No products found| retry[%s]", count)
             print("No products found")
+            suggestions = self.ol.suggest_terms(search_term)
+            if suggestions:
+                options = [(chr(ord("A") + i), term) for i, term in enumerate(suggestions)]
+                options.append((chr(ord("A") + len(suggestions)), "Search again"))
+                print("Did you mean:")
+                choice = self.option_conflict_list(options)
+                if choice is not None and choice != options[-1][0]:
+                    search_term = dict(options)[choice]
+                    selected_products = self.ol.search_data(search_term)
+                    if selected_products:
+                        logging.info("Products found for suggestion [%s]|returning Found products", search_term)
+                        return search_term, selected_products
             if count > 2:
                 print("Enter 'q' to go back")
                 print()
@@ -788,7 +4284,8 @@ class UserInterfaceLayer:
                    ("B", "Display Products"),
                    ("C", "Search Products"),
                    ("D", "Display Product Analysis"),
-                   ("E", "Quit")
+                   ("E", "Import Products"),
+                   ("F", "Quit")
                    ]
         print(f"{'=' * 7} Advanced Inventory Management System {'=' * 7}")
         while True:
@@ -798,7 +4295,7 @@ class UserInterfaceLayer:
             for i in options:
                 print(f"[{i[0]}] {i[1]}")
             choice = input("Select an option: ").strip().upper()
-            if choice == "E":
+            if choice == "F":
                 logging.info("User Decided to Quit\nProgramme Ended\n")
                 print("Goodbye!!!")
                 return
@@ -823,14 +4320,42 @@ class UserInterfaceLayer:
                 logging.info("User Decided to: Request for Analysis")
                 self.display_summary_analysis()
 
+            elif choice == "E":
+                logging.info("User Decided to: Import Products")
+                self.import_products_menu()
+                print()
+
             else:
                 logging.info("User Entered an Invalid Input\n")
                 print("Invalid Input")
 
 
+def create_data_layer():
+    db_path, wal_dir = os.environ.get("AIMS_DB"), os.environ.get("AIMS_WAL_DIR")
+    shards, snapshot_path = os.environ.get("AIMS_SHARDS"), os.environ.get("AIMS_SNAPSHOT")
+    if shards:
+        return ShardedDataLayer(int(shards), os.environ.get("AIMS_SHARD_BY", "id"),
+                                os.environ.get("AIMS_STORE") == "columnar")
+    if db_path:
+        return SQLiteDataLayer(db_path)
+    if wal_dir:
+        return DurableDataLayer(wal_dir)
+    if snapshot_path:
+        if not os.path.exists(snapshot_path):
+            write_binary_snapshot(DataLayer(), snapshot_path)
+        return MappedDataLayer(snapshot_path)
+    if os.environ.get("AIMS_STORE") == "columnar":
+        return ColumnarDataLayer()
+    return DataLayer()
+
+
 if __name__ == "__main__":
-    ui = UserInterfaceLayer(operation_layer=OperationLayer())
-    ui.run_program()
+    data_layer = create_data_layer()
+    ui = UserInterfaceLayer(operation_layer=OperationLayer(data_layer=data_layer))
+    try:
+        ui.run_program()
+    finally:
+        data_layer.close()
 
 
 
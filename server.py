@@ -0,0 +1,359 @@
+import argparse, asyncio, json, logging, os
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from urllib.parse import urlsplit, parse_qs
+
+import main
+
+FIELDS = ["name", "company", "category", "sub_category", "price", "stock", "ID"]
+REASONS = {200: "OK", 201: "Created", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+           413: "Payload Too Large", 422: "Unprocessable Entity", 431: "Request Header Fields Too Large",
+           500: "Internal Server Error", 501: "Not Implemented"}
+
+Request = namedtuple("Request", ["method", "path", "query", "body", "keep_alive"])
+
+
+class HttpError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+class InventoryServer:
+    def __init__(self, operation_layer, host="127.0.0.1", port=8080, workers=8, max_body=1024 * 1024,
+                 keepalive_timeout=15, pipeline_depth=64):
+        self.ol = operation_layer
+        self.host = host
+        self.port = port
+        self.workers = workers
+        self.max_body = max_body
+        self.keepalive_timeout = keepalive_timeout
+        self.pipeline_depth = pipeline_depth
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="inventory-worker")
+        self.routes = {
+            ("POST", "/products"): self.add_product,
+            ("GET", "/products"): self.list_products,
+            ("POST", "/restock"): self.restock,
+            ("POST", "/stock-movements"): self.stock_movements,
+            ("GET", "/search"): self.search,
+            ("GET", "/filter"): self.filter,
+            ("GET", "/analysis"): self.analysis,
+            ("GET", "/report"): self.report,
+            ("GET", "/low-stock"): self.low_stock,
+            ("GET", "/facets"): self.facets,
+            ("GET", "/history"): self.history,
+            ("GET", "/running-out"): self.running_out,
+            ("POST", "/reorder-points"): self.reorder_point,
+        }
+        self.paths = {path for _, path in self.routes}
+
+    async def serve(self):
+        server = await asyncio.start_server(self.serve_connection, self.host, self.port)
+        logging.warning("Serving inventory on http://%s:%s with %s worker(s)", self.host, self.port, self.workers)
+        async with server:
+            await server.serve_forever()
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+
+    async def serve_connection(self, reader, writer):
+        responses = asyncio.Queue(self.pipeline_depth)
+        sender = asyncio.create_task(self.send_responses(responses, writer))
+        in_flight = []
+        try:
+            while True:
+                try:
+                    request = await self.read_request(reader)
+                except HttpError as error:
+                    await responses.put((asyncio.ensure_future(self.respond(error.status, {"error": error.message})),
+                                         False))
+                    break
+                if request is None:
+                    break
+
+                if request.method == "GET":
+                    task = asyncio.ensure_future(self.dispatch(request))
+                    in_flight = [t for t in in_flight if not t.done()]
+                    in_flight.append(task)
+                else:
+                    if in_flight:
+                        await asyncio.wait(in_flight)
+                        in_flight = []
+                    task = asyncio.ensure_future(self.dispatch(request))
+                    await asyncio.wait([task])
+                await responses.put((task, request.keep_alive))
+                if not request.keep_alive:
+                    break
+        finally:
+            await responses.put(None)
+            await sender
+            writer.close()
+
+    async def send_responses(self, responses, writer):
+        broken = False
+        while True:
+            item = await responses.get()
+            if item is None:
+                return
+            task, keep_alive = item
+            if broken:
+                task.cancel()
+                continue
+            status, body = await task
+            try:
+                writer.write(self.render(status, body, keep_alive))
+                await writer.drain()
+            except ConnectionError:
+                logging.info("Client went away | Dropping remaining pipelined responses")
+                broken = True
+
+    async def read_request(self, reader):
+        try:
+            head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), self.keepalive_timeout)
+        except (asyncio.IncompleteReadError, asyncio.TimeoutError, ConnectionError):
+            return None
+        except asyncio.LimitOverrunError:
+            raise HttpError(431, "Request headers too large")
+
+        lines = head.decode("latin-1").split("\r\n")
+        try:
+            method, target, version = lines[0].split(" ", 2)
+        except ValueError:
+            raise HttpError(400, "Malformed request line")
+        headers = {}
+        for line in lines[1:]:
+            if line:
+                key, _, value = line.partition(":")
+                headers[key.strip().lower()] = value.strip()
+
+        if "chunked" in headers.get("transfer-encoding", "").lower():
+            raise HttpError(501, "Chunked request bodies are not supported")
+        try:
+            length = int(headers.get("content-length", 0))
+        except ValueError:
+            raise HttpError(400, "Invalid Content-Length")
+        if length > self.max_body:
+            raise HttpError(413, f"Request body above {self.max_body} bytes")
+        try:
+            body = await asyncio.wait_for(reader.readexactly(length), self.keepalive_timeout) if length else b""
+        except (asyncio.IncompleteReadError, asyncio.TimeoutError, ConnectionError):
+            logging.info("Request body cut short | Closing connection")
+            return None
+
+        connection = headers.get("connection", "").lower()
+        keep_alive = connection != "close" if version == "HTTP/1.1" else connection == "keep-alive"
+        url = urlsplit(target)
+        query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        return Request(method.upper(), url.path, query, body, keep_alive)
+
+    async def dispatch(self, request):
+        handler = self.routes.get((request.method, request.path))
+        if handler is None:
+            if request.path in self.paths:
+                return await self.respond(405, {"error": f"{request.method} not allowed on {request.path}"})
+            return await self.respond(404, {"error": f"No endpoint {request.path}"})
+        return await asyncio.get_running_loop().run_in_executor(self.executor, self.call, handler, request)
+
+    async def respond(self, status, payload):
+        return status, json.dumps(payload).encode()
+
+    def call(self, handler, request):
+        try:
+            try:
+                payload = json.loads(request.body) if request.body else {}
+            except ValueError as error:
+                raise HttpError(400, f"Invalid JSON: {error}")
+            if not isinstance(payload, dict):
+                raise HttpError(400, "Request body must be a JSON object")
+            status, result = handler(request.query, payload)
+        except HttpError as error:
+            status, result = error.status, {"error": error.message}
+        except Exception:
+            logging.exception("Request failed [%s %s]", request.method, request.path)
+            status, result = 500, {"error": "Internal server error"}
+        if logging.root.isEnabledFor(logging.INFO):
+            logging.info("%s %s -> %s", request.method, request.path, status)
+        return status, json.dumps(result).encode()
+
+    def render(self, status, body, keep_alive):
+        head = (f"HTTP/1.1 {status} {REASONS.get(status, '')}\r\n"
+                f"Content-Type: application/json\r\n"
+                f"Content-Length: {len(body)}\r\n"
+                f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+        return head.encode("latin-1") + body
+
+    def add_product(self, query, body):
+        is_valid, info = self.ol.validate_import_row(body)
+        if not is_valid:
+            raise HttpError(422, info)
+        info.append(self.ol.allocate_id(info))
+        product_data = dict(zip(FIELDS, info))
+        self.ol.add_product(product_data)
+        return 201, {"ID": product_data["ID"]}
+
+    def list_products(self, query, body):
+        sort_by = query.get("sort", "ID")
+        if sort_by not in ("ID", "name", "price", "stock"):
+            raise HttpError(422, "sort must be one of ID, name, price, stock")
+        try:
+            page_size = int(query.get("page_size", 50))
+            cursor = json.loads(query["cursor"]) if "cursor" in query else None
+        except ValueError:
+            raise HttpError(422, "page_size must be an integer and cursor the next_cursor of a previous page")
+        if not 0 < page_size <= 1000:
+            raise HttpError(422, "page_size must be between 1 and 1000")
+        value_type = str if sort_by in ("ID", "name") else (int, float)
+        if cursor is not None and (not isinstance(cursor, list) or len(cursor) != 2
+                                   or not isinstance(cursor[0], value_type) or isinstance(cursor[0], bool)
+                                   or not isinstance(cursor[1], str)):
+            raise HttpError(422, "cursor must be the next_cursor of a previous page")
+        page, next_cursor = self.ol.list_products(sort_by, query.get("desc") in ("1", "true"), cursor, page_size)
+        return 200, {"products": [product._asdict() for product in page],
+                     "next_cursor": json.dumps(next_cursor) if next_cursor is not None else None}
+
+    def restock(self, query, body):
+        amount = body.get("amount")
+        if not isinstance(amount, int) or isinstance(amount, bool):
+            raise HttpError(422, "amount must be an integer")
+        i_d, p_name = body.get("ID"), body.get("name")
+        if i_d is None and p_name is None:
+            raise HttpError(422, "ID or name is required")
+        if not all(key is None or isinstance(key, str) for key in (i_d, p_name)):
+            raise HttpError(422, "ID and name must be strings")
+        is_done, info = self.ol.restock(amount, i_d=i_d, p_name=p_name)
+        if not is_done:
+            raise HttpError(422, info)
+        return 200, {"stock": info}
+
+    def stock_movements(self, query, body):
+        movements = body.get("movements")
+        if not isinstance(movements, list) or not all(
+                isinstance(m, list) and len(m) == 2 and isinstance(m[0], str)
+                and isinstance(m[1], int) and not isinstance(m[1], bool) for m in movements):
+            raise HttpError(422, "movements must be a list of [ID or name, delta] pairs")
+        is_done, info = self.ol.apply_stock_movements(movements)
+        if not is_done:
+            return 422, {"error": "Stock movements rejected | Nothing applied",
+                         "rejected": [{"position": position, "key": key, "error": error}
+                                      for position, key, error in info]}
+        return 200, {"stocks": info}
+
+    def search(self, query, body):
+        term = query.get("q", "").strip()
+        if not term:
+            raise HttpError(422, "q is required")
+        products = self.ol.search_data(term) or []
+        if not products:
+            return 200, {"products": [], "did_you_mean": self.ol.suggest_terms(term)}
+        return 200, {"products": [product._asdict() for product in products]}
+
+    def filter(self, query, body):
+        ranges = {}
+        for field, cast in (("price", float), ("stock", int)):
+            try:
+                lo, hi = (cast(query[key]) if key in query else None for key in (f"{field}_min", f"{field}_max"))
+            except ValueError:
+                raise HttpError(422, f"{field} bounds must be numbers")
+            if lo is not None or hi is not None:
+                ranges[field] = (lo, hi)
+        try:
+            limit = int(query.get("limit", 100))
+        except ValueError:
+            raise HttpError(422, "limit must be an integer")
+        products = self.ol.query(company=query.get("company"), category=query.get("category"),
+                                 sub_category=query.get("sub_category"), name=query.get("name"), **ranges)
+        return 200, {"products": [product._asdict() for product in islice(products, max(0, limit))]}
+
+    def facets(self, query, body):
+        fields = {attribute: field for field, attribute in self.ol.dl.facet_attributes.items()}
+        field = fields.get(query.get("field"))
+        if field is None:
+            raise HttpError(422, f"field must be one of {sorted(fields)}")
+        try:
+            page, page_size = int(query.get("page", 0)), int(query.get("page_size", 50))
+        except ValueError:
+            raise HttpError(422, "page and page_size must be integers")
+        if page < 0 or not 0 < page_size <= 1000:
+            raise HttpError(422, "page must be >= 0 and page_size between 1 and 1000")
+        total, values = self.ol.browse_facet(field, query.get("prefix", ""), page, page_size)
+        return 200, {"total": total, "page": page, "values": [{"value": value, "products": count}
+                                                              for value, count in values]}
+
+    def history(self, query, body):
+        key = query.get("ID") or query.get("name")
+        if not key:
+            raise HttpError(422, "ID or name is required")
+        is_found, movements = self.ol.stock_movements(key)
+        if not is_found:
+            raise HttpError(404, movements)
+        is_found, forecast = self.ol.stock_forecast(key)
+        return 200, {"movements": [{"at": at, "delta": delta} for at, delta in movements],
+                     "forecast": forecast if is_found else None}
+
+    def running_out(self, query, body):
+        try:
+            days = float(query.get("days", 7))
+        except ValueError:
+            raise HttpError(422, "days must be a number")
+        return 200, {"products": [{**product._asdict(), **forecast} for product, forecast in self.ol.running_out(days)]}
+
+    def low_stock(self, query, body):
+        return 200, {"products": [product._asdict() for product in self.ol.get_low_stock()]}
+
+    def reorder_point(self, query, body):
+        is_done, info = self.ol.set_reorder_threshold(body.get("threshold"), body.get("category"), body.get("ID"))
+        if not is_done:
+            raise HttpError(422, info)
+        return 200, {"rechecked": info}
+
+    def analysis(self, query, body):
+        analysis = self.ol.inventory_analysis()
+        if not analysis:
+            return 200, {"products": 0}
+        (count_category, count_sub_category, count_company, count_low_stocks, low_stocks,
+         avg_stocks_per_category) = analysis
+        return 200, {
+            "products": sum(count_category.values()),
+            "count_by_category": count_category,
+            "count_by_sub_category": count_sub_category,
+            "count_by_company": count_company,
+            "low_stock_count": count_low_stocks,
+            "low_stock": low_stocks,
+            "avg_stock_per_category": avg_stocks_per_category,
+        }
+
+
+    def report(self, query, body):
+        try:
+            percentiles = tuple(float(p) for p in query.get("percentiles", "25,50,75,90,99").split(","))
+            bins = int(query.get("bins", 10))
+        except ValueError:
+            raise HttpError(422, "percentiles must be comma separated numbers and bins an integer")
+        if not all(0 <= p <= 100 for p in percentiles) or not 0 < bins <= 1000:
+            raise HttpError(422, "percentiles must be within 0-100 and bins between 1 and 1000")
+        return 200, self.ol.inventory_report(percentiles, bins) or {"products": 0}
+
+
+def main_cli(argv=None):
+    parser = argparse.ArgumentParser(description="Serve the inventory as JSON over HTTP")
+    parser.add_argument("--host", default=os.environ.get("AIMS_HOST", "127.0.0.1"))
+    parser.add_argument("--port", type=int, default=int(os.environ.get("AIMS_PORT", 8080)))
+    parser.add_argument("--workers", type=int, default=int(os.environ.get("AIMS_WORKERS", 8)),
+                        help="threads running OperationLayer calls")
+    args = parser.parse_args(argv)
+
+    data_layer = main.create_data_layer()
+    server = InventoryServer(main.OperationLayer(data_layer=data_layer), args.host, args.port, args.workers)
+    try:
+        asyncio.run(server.serve())
+    except KeyboardInterrupt:
+        logging.warning("Server stopped")
+    finally:
+        server.close()
+        data_layer.close()
+
+
+if __name__ == "__main__":
+    main_cli()